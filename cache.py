@@ -0,0 +1,94 @@
+import hashlib
+import os
+import pickle
+import sys
+
+
+class ResultCache:
+    version = 1
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, *parts):
+        text = repr((ResultCache.version, *parts))
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    def get(self, key, fingerprint):
+        name = self.entry(key)
+        try:
+            with open(name, 'rb') as f:
+                stored, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        # Source has changed since the entry was written
+        if stored != fingerprint:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+            self.invalidated += 1
+            self.misses += 1
+            return None
+
+        # Record access time for eviction
+        try:
+            os.utime(name)
+        except FileNotFoundError:
+            pass
+
+        self.hits += 1
+        return value
+
+    def put(self, key, fingerprint, value):
+        name = self.entry(key)
+        temp = f'{name}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as f:
+            pickle.dump((fingerprint, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp, name)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.pkl'):
+                continue
+
+            # Entries may be evicted or replaced by another process meanwhile
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.size:
+                break
+
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+            total -= size
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self, file=sys.stderr):
+        print(f'cache: {self.hits} hits, {self.misses} misses, {self.invalidated} invalidated ({self.hit_rate():.1%} hit rate)', file=file)
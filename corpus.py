@@ -18,6 +18,7 @@ class TokenType:
     speaker = 4
     date = 5
     content = 6
+    result = 7
 
 
 class Turn:
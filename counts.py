@@ -0,0 +1,144 @@
+import heapq
+import os
+import re
+from collections import Counter
+from corpus import Conversation
+
+
+def version_order(part: str):
+    """Characters in the order of sort -V: ~, then the end of the part, letters, and everything else"""
+    return [-1 if c == '~' else ord(c) if c.isascii() and c.isalpha() else ord(c) + 256 for c in part] + [0]
+
+
+def version_key(text: str):
+    """Sort key ordering digit runs numerically, as in sort -V"""
+    # The last match is always empty, and marks the end of the text
+    parts = [(version_order(part), int(number or 0)) for part, number in re.findall(r'(\D*)(\d*)', text)]
+    # Equal versions fall back to comparing the text
+    return parts, text
+
+
+class SpaceSaving:
+    """
+    Bounded approximate counts of the most frequent items in a stream.
+    Each count overestimates the true count by at most its error.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.heap = []
+
+    def add(self, item, count=1):
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.size:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the minimum item, inheriting its count as error
+            minimum, victim = self.pop()
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[item] = minimum + count
+            self.errors[item] = minimum
+
+        heapq.heappush(self.heap, (self.counts[item], item))
+        if len(self.heap) > 4 * self.size:
+            self.heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def pop(self):
+        # Discard heap entries made stale by later increments
+        while True:
+            count, item = heapq.heappop(self.heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    def items(self):
+        return self.counts.items()
+
+    def bounds(self):
+        """Guaranteed lower bound and possible overcount of each kept item"""
+        for item, count in self.counts.items():
+            yield item, count - self.errors[item], self.errors[item]
+
+
+class BaseCounts:
+    """Base form counts at phrase positions, optionally grouped by speaker or document"""
+    def __init__(self, positions: list[int]=None, group=None, top: int=None):
+        self.positions = positions
+        self.group = group
+        self.top = top
+        self.tables = {}
+
+    def table(self, key):
+        table = self.tables.get(key)
+        if table is None:
+            table = SpaceSaving(self.top) if self.top else Counter()
+            self.tables[key] = table
+
+        return table
+
+    def add(self, group, bases: list[str]):
+        positions = self.positions or range(1, len(bases) + 1)
+        for position in positions:
+            if position <= len(bases):
+                table = self.table((group, position))
+                if self.top:
+                    table.add(bases[position - 1])
+                else:
+                    table[bases[position - 1]] += 1
+
+    def count(self, conversations: list[Conversation]):
+        for conversation in conversations:
+            for turn in conversation.turns:
+                group = None
+                if self.group == 'speaker':
+                    group = turn.speaker
+                elif self.group == 'document':
+                    group = conversation.document
+
+                for _, (_, bases) in turn.text:
+                    self.add(group, bases)
+
+        return self
+
+    def sorted(self, key):
+        """Count table in the order of sort -k 1 -V -r"""
+        if self.top:
+            lines = [f'{count} {item} +{error}' for item, count, error in self.tables[key].bounds()]
+        else:
+            lines = [f'{count} {item}' for item, count in self.tables[key].items()]
+
+        return sorted(lines, key=version_key, reverse=True)
+
+    def heading(self):
+        if self.top:
+            return f'# approximate top {self.top}: lower bound, base form, possible overcount'
+
+    def name(self, key):
+        group, position = key
+        return f'{group}-{position}' if self.group else str(position)
+
+    def write(self, path):
+        os.makedirs(path, exist_ok=True)
+        for key in self.tables:
+            with open(os.path.join(path, self.name(key) + '.txt'), 'w', encoding='utf-8') as f:
+                if self.top:
+                    print(self.heading(), file=f)
+
+                for line in self.sorted(key):
+                    print(line, file=f)
+
+    def print(self):
+        keys = sorted(self.tables, key=lambda key: (str(key[0]), key[1]))
+        if self.top:
+            print(self.heading())
+
+        for key in keys:
+            if len(keys) > 1:
+                print(f'# {self.name(key)}')
+
+            for line in self.sorted(key):
+                print(line)
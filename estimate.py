@@ -0,0 +1,82 @@
+import math
+import random
+from statistics import NormalDist
+
+
+class Sampler:
+    units = ['document', 'conversation', 'line']
+
+    def __init__(self, unit='document', rate=1.0, error=0.05, confidence=0.95, minimum=5, seed=None):
+        self.unit = unit
+        self.rate = rate if unit != 'document' else 1.0
+        self.error = error
+        self.confidence = confidence
+        self.minimum = minimum
+        self.population = 0
+        self.random = random.Random(seed)
+
+    def order(self, labels):
+        labels = list(labels)
+        self.random.shuffle(labels)
+        self.population = len(labels)
+        return labels
+
+    def include(self, unit):
+        if unit != self.unit or self.rate >= 1:
+            return True
+
+        return self.random.random() < self.rate
+
+
+class Estimate:
+    """
+    Estimate per-key totals from a simple random sample of documents.
+    Documents read at a sub-document rate contribute inverse-probability
+    weighted counts, and the variance is estimated between documents.
+    """
+    def __init__(self, population: int, confidence=0.95, corrected=True):
+        self.population = population
+        self.corrected = corrected
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.n = 0
+        self.sums = {}
+        self.squares = {}
+        self.grand = [0.0, 0.0]
+
+    def add(self, counts: dict, weight=1.0):
+        self.n += 1
+        total = 0
+        for key in counts:
+            value = counts[key] * weight
+            self.sums[key] = self.sums.get(key, 0) + value
+            self.squares[key] = self.squares.get(key, 0) + value * value
+            total += value
+
+        self.grand[0] += total
+        self.grand[1] += total * total
+
+    def interval(self, sum, squares):
+        n, N = self.n, self.population
+        mean = sum / n
+        if n < 2:
+            return N * mean, math.inf
+
+        variance = max(squares - n * mean * mean, 0) / (n - 1)
+        fpc = 1 - n / N if self.corrected else 1
+        return N * mean, self.z * N * math.sqrt(fpc * variance / n)
+
+    def total(self, key):
+        return self.interval(self.sums[key], self.squares[key])
+
+    def error(self):
+        if not self.n:
+            return math.inf
+
+        estimate, width = self.interval(*self.grand)
+        if not estimate:
+            return 0 if self.n == self.population else math.inf
+
+        return width / estimate
+
+    def keys(self):
+        return self.sums.keys()
@@ -1,3 +1,6 @@
+import os
+
+
 class FileReader:
     def __init__(self, name, encoding):
         self.name = name
@@ -26,6 +29,22 @@ class FileReader:
         return ''.join(map(c) for c in line)
 
 
+    def fingerprint(self, label):
+        stat = os.stat(self.name.format(label))
+        return stat.st_size, stat.st_mtime_ns
+
+    def size(self, label):
+        return os.path.getsize(self.name.format(label))
+
+    def labels(self, start=1):
+        label = start
+        while os.path.exists(self.name.format(label)):
+            yield label
+            label += 1
+
+    def corpus_size(self, start=1):
+        return sum(self.size(label) for label in self.labels(start))
+
     def read_file(self, label):
         name = self.name.format(label)
         with open(name, 'r', encoding=self.encoding) as f:
@@ -37,6 +56,15 @@ class InputReader:
     def __init__(self):
         self.terminated = False
 
+    def size(self, _):
+        return 0
+
+    def labels(self, start=1):
+        return [start]
+
+    def corpus_size(self, start=1):
+        return 0
+
     def read_file(self, _):
         if self.terminated:
             raise FileNotFoundError("Input reading has been terminated.")
@@ -1,8 +1,15 @@
 import argparse
+import sys
 from datetime import datetime
+from cache import ResultCache
 from corpus import Conversation, Corpus
+from estimate import Sampler
 from files import FileReader, InputReader
-from query import DocumentQuery, FeatureQuery, StringQuery, TextQuery
+from metrics import Metrics
+from progress import Progress, QueryTimeout
+from results import ResultSet, present
+from query import DocumentQuery, FeatureQuery, StringQuery, TextQuery, limit_lines, sample_lines
+from stages import Profiler
 from summary import ConversationFormatter, Summary
 
 
@@ -11,10 +18,29 @@ parser.add_argument('-i', '--interactive', action=argparse.BooleanOptionalAction
 parser.add_argument('-d', '--document', type=int)
 parser.add_argument('-g', '--goto', type=int)
 parser.add_argument('-r', '--range', type=int, default=0)
+parser.add_argument('-l', '--limit', type=int)
+parser.add_argument('-n', '--sample', type=int)
+parser.add_argument('--seed', type=int)
+parser.add_argument('-P', '--progress', action=argparse.BooleanOptionalAction)
+parser.add_argument('--timeout', type=float)
+parser.add_argument('--resume', type=int, default=0, help='Continue after the last completed document')
+parser.add_argument('-R', '--results', help='Query a saved result set instead of the corpus')
+parser.add_argument('-o', '--save', help='Save results as a result set')
+parser.add_argument('-j', '--jobs', type=int, default=1, help='Query documents across this many worker processes')
+parser.add_argument('-C', '--cache')
+parser.add_argument('--cache-size', type=int, default=256, help='Cache size in MB')
+parser.add_argument('--metrics', help='Write a JSON metrics record to this file')
+parser.add_argument('--profile', action=argparse.BooleanOptionalAction, help='Report time spent in each stage')
+parser.add_argument('--profile-dump', help='Write cProfile statistics to this file')
+parser.add_argument('--profile-stacks', help='Write collapsed stage stacks (for flamegraphs) to this file')
 
 parser.add_argument('-s', '--summary', action=argparse.BooleanOptionalAction)
 parser.add_argument('-a', '--all', action=argparse.BooleanOptionalAction)
 parser.add_argument('-c', '--count')
+parser.add_argument('-A', '--approximate', type=float, help='Estimate summary counts to within a relative error')
+parser.add_argument('--unit', choices=Sampler.units, default='document')
+parser.add_argument('--rate', type=float, default=0.1, help='Sampling rate for conversation or line units')
+parser.add_argument('--confidence', type=float, default=0.95)
 
 parser.add_argument('-D', '--date', type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
 parser.add_argument('-t', '--type', type=int)
@@ -31,31 +57,114 @@ def show_lines(formatter: ConversationFormatter, conversations: list[Conversatio
                 yield (conversation.document, n, formatter.format_date(conversation), turn.speaker, formatter.print_text(text))
 
 
-def run(args, query: TextQuery):
+def open_cache(args):
+    if not args.cache:
+        return None
+
+    return ResultCache(args.cache, args.cache_size * 2 ** 20)
+
+
+def open_progress(args):
+    return Progress(timeout=args.timeout, verbose=args.progress)
+
+
+def open_metrics(args, command):
+    if not args.metrics:
+        return None
+
+    return Metrics(command)
+
+
+def write_metrics(args, metrics: Metrics, progress: Progress, cache: ResultCache=None):
+    metrics.count('documents', progress.documents)
+    metrics.count('lines', progress.lines)
+    metrics.count('words', progress.words)
+    if cache:
+        metrics.cache('results', cache.hit_rate())
+
+    metrics.write(args.metrics)
+
+
+def open_profiler(args, name, query: TextQuery):
+    if not (args.profile or args.profile_dump or args.profile_stacks):
+        return None
+
+    profiler = Profiler(name, args.profile_dump, args.profile_stacks)
+    profiler.wrap(FileReader, 'read_file', 'decode')
+    profiler.wrap(Corpus, 'read', 'corpus')
+    profiler.wrap(sys.modules[Corpus.__module__], 'read_content', 'content')
+    profiler.wrap(type(query), 'apply', 'query', lambda args, _: len(args[2]) if isinstance(args[2], list) else 1)
+
+    main = sys.modules['__main__']
+    for output in ['display', 'show_base']:
+        if hasattr(main, output):
+            profiler.wrap(main, output, 'output')
+
+    return profiler
+
+
+def open_sampler(args):
+    if args.approximate is None:
+        return None
+
+    return Sampler(
+        unit=args.unit,
+        rate=args.rate,
+        error=args.approximate,
+        confidence=args.confidence,
+        seed=args.seed
+    )
+
+
+def run(args, query: TextQuery, cache: ResultCache=None, progress: Progress=None, sampler: Sampler=None, profiler: Profiler=None):
     if args.interactive:
         reader = InputReader()
     else:
         reader = FileReader(name='MBC-raw/mbc{:03d}-not-stripped.txt', encoding='cp1252')
 
+    if progress and progress.verbose:
+        progress.total = reader.corpus_size(args.resume + 1)
+
     documents = DocumentQuery(
         reader=reader,
         corpus=corpus,
         query=query,
         type=args.type,
         speaker=args.speaker,
-        date=args.date
+        date=args.date,
+        cache=cache,
+        progress=progress
     )
-    if not args.document:
-        conversations = documents.query_all()
+    documents.profiler = profiler
+    if args.save and not sampler:
+        query.materialize = True
+
+    if sampler:
+        return documents.sample_documents(sampler.order(reader.labels(args.resume + 1)), sampler)
+    elif args.results:
+        conversations = documents.filter(ResultSet.read(args.results))
+    elif not args.document and args.jobs > 1 and isinstance(reader, FileReader):
+        conversations = documents.query_parallel(args.jobs, args.resume + 1)
+    elif not args.document:
+        conversations = documents.query_all(args.resume + 1)
     elif args.goto:
         conversations = documents.goto_line(args.document, args.goto, args.range)
     else:
         conversations = documents.filter_conversations(args.document)
 
+    if args.sample is not None:
+        conversations = sample_lines(conversations, args.sample, args.seed)
+
+    if args.limit is not None:
+        conversations = limit_lines(conversations, args.limit)
+
+    if args.save and not sampler:
+        conversations = present(query, ResultSet.write(args.save, conversations))
+
     return conversations
 
 
-def display(args, conversations, formatter: ConversationFormatter):
+def display(args, conversations, formatter: ConversationFormatter, sampler: Sampler=None):
     def quote(text: str):
         if not text:
             return ''
@@ -77,9 +186,10 @@ def display(args, conversations, formatter: ConversationFormatter):
         formatter=formatter,
         conversations=conversations,
         all=args.all,
-        count=args.count
+        count=args.count,
+        sampler=sampler
     )
-    if args.summary:
+    if args.summary or sampler:
         summary.show()
     else:
         if args.text:
@@ -118,5 +228,22 @@ if __name__ == '__main__':
     )
     
     formatter = ConversationFormatter(format=args.format)
-    conversations = run(args, query)
-    display(args, conversations, formatter)
+    cache = open_cache(args)
+    progress = open_progress(args)
+    sampler = open_sampler(args)
+    metrics = open_metrics(args, 'mbc')
+    profiler = open_profiler(args, 'mbc', query)
+    conversations = run(args, query, cache, progress, sampler, profiler)
+    try:
+        display(args, conversations, formatter, sampler)
+    except (KeyboardInterrupt, QueryTimeout) as e:
+        progress.interrupt(str(e) or 'cancelled')
+
+    sys.stdout.flush()
+    progress.finish()
+    if cache:
+        cache.report()
+    if profiler:
+        profiler.finish()
+    if metrics:
+        write_metrics(args, metrics, progress, cache)
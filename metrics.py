@@ -0,0 +1,51 @@
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, if known"""
+    if not resource:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Metrics:
+    """Counts and timings of one command, written as a JSON record when it finishes"""
+    def __init__(self, command):
+        self.command = command
+        self.counts: dict[str, int] = {}
+        self.hit_rates: dict[str, float] = {}
+        self.start = time.perf_counter(), time.process_time()
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def cache(self, name, hit_rate):
+        self.hit_rates[name] = round(hit_rate, 4)
+
+    def record(self):
+        wall = time.perf_counter() - self.start[0]
+        return {
+            'command': self.command,
+            'arguments': sys.argv[1:],
+            'finished': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            **self.counts,
+            'wall': round(wall, 4),
+            'cpu': round(time.process_time() - self.start[1], 4),
+            'throughput': {f'{name}/s': round(n / wall, 2) if wall else None for name, n in self.counts.items()},
+            'peak_rss': peak_rss(),
+            'cache': self.hit_rates
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.record(), f, indent=2)
+            f.write('\n')
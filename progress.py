@@ -0,0 +1,90 @@
+import sys
+import time
+
+from corpus import TokenType
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class Progress:
+    def __init__(self, total=0, timeout=None, verbose=False, interval=0.5, file=sys.stderr):
+        self.total = total
+        self.timeout = timeout
+        self.verbose = verbose
+        self.interval = interval
+        self.file = file
+        self.documents = 0
+        self.lines = 0
+        self.words = 0
+        self.size = 0
+        self.checkpoint = None
+        self.interrupted = None
+        self.start = time.monotonic()
+        self.shown = self.start
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def line(self, type, value):
+        self.lines += 1
+        if type == TokenType.content:
+            self.words += len(value)
+
+        self.check()
+
+    def complete(self, label, size=0):
+        self.documents += 1
+        self.size += size
+        self.checkpoint = label
+        self.check()
+
+    def check(self):
+        now = time.monotonic()
+        if self.timeout and now - self.start > self.timeout:
+            raise QueryTimeout(f'Query exceeded {self.timeout}s')
+
+        if self.verbose and now - self.shown >= self.interval:
+            self.shown = now
+            self.show()
+
+    def eta(self):
+        if not self.total or not self.size:
+            return None
+
+        return self.elapsed() * (self.total - self.size) / self.size
+
+    def show(self, end='\r'):
+        elapsed = self.elapsed() or 1e-9
+        status = [
+            f'{self.documents} documents',
+            f'{self.lines} lines',
+            f'{self.words} words',
+            f'{self.words / elapsed:.0f} words/s'
+        ]
+
+        if self.total:
+            status.append(f'{self.size / self.total:.1%}')
+
+        eta = self.eta()
+        if eta is not None:
+            status.append(f'ETA {eta:.0f}s')
+
+        print(', '.join(status), end=end, file=self.file, flush=True)
+
+    def interrupt(self, reason):
+        self.interrupted = reason
+
+    def finish(self):
+        if self.verbose:
+            self.show(end='\n')
+
+        if not self.interrupted:
+            return
+
+        print(f'Interrupted ({self.interrupted}) after {self.elapsed():.1f}s', file=self.file)
+        if self.checkpoint is not None:
+            print(f'Last completed document: {self.checkpoint} (continue with --resume {self.checkpoint})', file=self.file)
+        else:
+            print('No document was completed', file=self.file)
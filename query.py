@@ -1,8 +1,17 @@
 from abc import ABC, abstractmethod
+import copy
+from multiprocessing import Pool
+import random
 import re
-from content import Word
+import numpy as np
+from cache import ResultCache
+from content import Feature, Word
 from corpus import Conversation, Corpus, TokenType, Turn
+from estimate import Sampler
 from files import FileReader
+from progress import Progress, QueryTimeout
+from results import Match
+from stages import Profiler
 
 
 class WordQuery(ABC):
@@ -10,6 +19,10 @@ class WordQuery(ABC):
     def match_word(self, word):
         pass
 
+    @abstractmethod
+    def key(self):
+        pass
+
 
 class StringQuery(WordQuery):
     def __init__(self, query, word):
@@ -25,6 +38,9 @@ class StringQuery(WordQuery):
         
         return self.query in word.text
 
+    def key(self):
+        return 'string', self.query, bool(self.word)
+
 
 class FeatureQuery(WordQuery):
     term = re.compile(r'[+-][A-Za-z_]+')
@@ -35,6 +51,14 @@ class FeatureQuery(WordQuery):
     def match_word(self, word: Word):
         on, off = self.features
         return all(word.features & on == on) and all(word.features & ~off == word.features)
+
+    def match_matrix(self, matrix):
+        on, off = self.features
+        return np.all(matrix & on == on, axis=1) & ~np.any(matrix & off, axis=1)
+
+    def key(self):
+        on, off = self.features
+        return 'features', on.tobytes(), off.tobytes()
     
     @staticmethod
     def parse(query):
@@ -59,6 +83,11 @@ class TextQuery:
         self.trim = trim
         self.buffer = FeatureQuery(buffer) if buffer else None
         self.end = end
+        self.materialize = False
+
+    def key(self):
+        buffer = self.buffer.key() if self.buffer else None
+        return 'text', tuple(term.key() for term in self.query), bool(self.trim), self.end, buffer, self.materialize
 
     def match_segment(self, segment):
         queries = [term for term in self.query]
@@ -117,6 +146,29 @@ class TextQuery:
         return []
 
     def apply(self, type, words: list[Word]):
+        if type == TokenType.result:
+            type, words = TokenType.content, words.words
+
+        results = self.match(type, words)
+        if self.materialize and type == TokenType.content:
+            return [Match(result) for result in results]
+
+        return results
+
+    def present(self, match: Match):
+        return match.words
+
+    def annotate(self, reader: FileReader, label, conversations: list[Conversation]):
+        return conversations
+
+    def counters(self):
+        """Counts kept while matching, to be summed across worker processes"""
+        return {}
+
+    def add_counters(self, counters: dict):
+        pass
+
+    def match(self, type, words: list[Word]):
         if not self.query and not self.buffer:
             return [words]
         
@@ -133,41 +185,96 @@ class TextQuery:
 
 
 class DocumentQuery:
-    def __init__(self, reader: FileReader, corpus: Corpus, query: TextQuery, type, speaker, date):
+    def __init__(self, reader: FileReader, corpus: Corpus, query: TextQuery, type, speaker, date, cache: ResultCache=None, progress: Progress=None):
         self.reader = reader
         self.corpus = corpus
         self.query = query
         self.type = type
         self.speaker = speaker
         self.date = date
+        self.cache = cache
+        self.progress = progress
+        self.sampler: Sampler = None
+        self.profiler: Profiler = None
+
+    def key(self):
+        return tuple(Feature.features), self.query.key(), self.type, self.speaker, self.date
         
+    def counters(self):
+        counters = self.query.counters()
+        if self.cache:
+            counters.update(cache_hits=self.cache.hits, cache_misses=self.cache.misses, cache_invalidated=self.cache.invalidated)
+
+        return counters
+
+    def add_counters(self, counters: dict):
+        self.query.add_counters(counters)
+        if self.cache:
+            self.cache.hits += counters['cache_hits']
+            self.cache.misses += counters['cache_misses']
+            self.cache.invalidated += counters['cache_invalidated']
+
     def filter_turns(self, turns: list[Turn]):
         for turn in turns:
             included = Turn(turn.speaker)
             for line in turn.text:
                 n, (t, v) = line
-                if self.type and t != self.type:
+                # Saved matches are content for the type filter
+                if self.type and (TokenType.content if t == TokenType.result else t) != self.type:
                     continue
 
                 if self.speaker and turn.speaker != self.speaker:
                     continue
 
+                if self.sampler and not self.sampler.include('line'):
+                    continue
+
+                if self.progress:
+                    self.progress.line(t, v)
+
                 results = self.query.apply(t, v)
                 for i, result in enumerate(results):
-                    included.add_text(f'{n}.{i}', (t, result))
+                    if t == TokenType.result:
+                        # Refined matches keep the identifier of the saved match
+                        included.add_text(n, (TokenType.content, result))
+                    else:
+                        included.add_text(f'{n}.{i}', (t, result))
             
             if len(included.text):
                 yield included
 
     def read_conversations(self, label):
         lines = self.reader.read_file(label)
-        return self.corpus.add_document(lines)
+        return self.query.annotate(self.reader, label, self.corpus.add_document(lines))
 
     def filter_conversations(self, label):
-        for conversation in self.read_conversations(label):
+        if not self.cache or not isinstance(self.reader, FileReader) or self.sampler and self.sampler.rate < 1:
+            return self.query_conversations(label)
+
+        return self.cached_conversations(label)
+
+    def cached_conversations(self, label):
+        key = self.cache.key(self.key(), self.reader.name, label)
+        fingerprint = self.reader.fingerprint(label)
+        conversations = self.cache.get(key, fingerprint)
+        if conversations is None:
+            conversations = list(self.query_conversations(label))
+            self.cache.put(key, fingerprint, conversations)
+
+        for conversation in conversations:
+            yield conversation
+
+    def query_conversations(self, label):
+        return self.filter(self.read_conversations(label))
+
+    def filter(self, conversations: list[Conversation]):
+        for conversation in conversations:
             if self.date and self.date != conversation.parse_date():
                 continue
 
+            if self.sampler and not self.sampler.include('conversation'):
+                continue
+
             result = Conversation(conversation.document, conversation.date)
             for turn in self.filter_turns(conversation.turns):
                 result.add_turn(turn)
@@ -175,16 +282,54 @@ class DocumentQuery:
             if len(result.turns):
                 yield result
 
-    def query_all(self):
-        label = 1
+    def query_all(self, start=1):
+        label = start
         while True:
             try:
                 for line in self.filter_conversations(label):
                     yield line
 
+                if self.progress:
+                    self.progress.complete(label, self.reader.size(label))
+
                 label += 1
             except FileNotFoundError:
                 break
+            except (KeyboardInterrupt, QueryTimeout) as e:
+                if not self.progress:
+                    raise
+
+                self.progress.interrupt(str(e) or 'cancelled')
+                break
+
+    def query_parallel(self, jobs, start=1):
+        """Query documents across worker processes, yielding conversations in document order"""
+        worker = copy.copy(self)
+        worker.progress = None
+        with Pool(jobs, initializer=start_worker, initargs=(worker,)) as pool:
+            try:
+                for label, conversations, lines, words, counters, stages in pool.imap(query_document, self.reader.labels(start)):
+                    self.add_counters(counters)
+                    if stages:
+                        self.profiler.add(*stages)
+
+                    yield from conversations
+
+                    if self.progress:
+                        self.progress.lines += lines
+                        self.progress.words += words
+                        self.progress.complete(label, self.reader.size(label))
+            except (KeyboardInterrupt, QueryTimeout) as e:
+                pool.terminate()
+                if not self.progress:
+                    raise
+
+                self.progress.interrupt(str(e) or 'cancelled')
+
+    def sample_documents(self, labels, sampler: Sampler):
+        self.sampler = sampler
+        for label in labels:
+            yield list(self.filter_conversations(label))
 
     def goto_line(self, document, goto, range):
         def get_turns():
@@ -197,6 +342,9 @@ class DocumentQuery:
                     elif n > goto + range:
                         break
 
+                    if self.progress:
+                        self.progress.line(t, v)
+
                     results = self.query.apply(t, v)
                     for result in results:
                         included.add_text(n, (t, result))
@@ -211,3 +359,86 @@ class DocumentQuery:
             
             if len(result.turns):
                 yield result
+
+
+_worker: DocumentQuery = None
+
+
+def start_worker(documents: DocumentQuery):
+    global _worker
+    _worker = documents
+
+
+def query_document(label):
+    _worker.progress = Progress()
+    # Stages are timed by the worker's copy of the profiler, and returned per document
+    if _worker.profiler:
+        _worker.profiler.reset()
+
+    before = _worker.counters()
+    conversations = list(_worker.filter_conversations(label))
+    counters = {name: count - before[name] for name, count in _worker.counters().items()}
+    stages = _worker.profiler.totals() if _worker.profiler else None
+    return label, conversations, _worker.progress.lines, _worker.progress.words, counters, stages
+
+
+def limit_lines(conversations: list[Conversation], limit: int):
+    remaining = limit
+    if remaining <= 0:
+        return
+
+    for conversation in conversations:
+        result = Conversation(conversation.document, conversation.date)
+        for turn in conversation.turns:
+            included = Turn(turn.speaker)
+            included.text = turn.text[:remaining]
+            remaining -= len(included.text)
+            if len(included.text):
+                result.add_turn(included)
+
+            if remaining <= 0:
+                break
+
+        if len(result.turns):
+            yield result
+
+        # Return before pulling the next conversation, so no further documents are read
+        if remaining <= 0:
+            return
+
+
+def sample_lines(conversations: list[Conversation], size: int, seed=None):
+    """Reservoir sample of result lines, regrouped in corpus order"""
+    rng = random.Random(seed)
+    reservoir = []
+    i = 0
+    for c, conversation in enumerate(conversations):
+        for t, turn in enumerate(conversation.turns):
+            for line in turn.text:
+                item = (i, c, t, conversation.document, conversation.date, turn.speaker, line)
+                if len(reservoir) < size:
+                    reservoir.append(item)
+                else:
+                    j = rng.randint(0, i)
+                    if j < size:
+                        reservoir[j] = item
+
+                i += 1
+
+    result, turn, last = None, None, None
+    for _, c, t, document, date, speaker, line in sorted(reservoir):
+        if not last or last[0] != c:
+            if result:
+                yield result
+
+            result = Conversation(document, date)
+
+        if last != (c, t):
+            turn = Turn(speaker)
+            result.add_turn(turn)
+
+        turn.text.append(line)
+        last = c, t
+
+    if result:
+        yield result
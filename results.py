@@ -0,0 +1,116 @@
+import pickle
+
+import numpy as np
+
+from content import Word
+from corpus import Conversation, TokenType, Turn
+from sentence.parser import Phrase
+
+
+def pack(features):
+    return int.from_bytes(np.packbits(features).tobytes(), 'big')
+
+
+def unpack(mask: int):
+    size = len(Word.features.none)
+    data = np.frombuffer(mask.to_bytes((size + 7) // 8, 'big'), dtype=np.uint8)
+    return np.unpackbits(data)[:size].astype(bool)
+
+
+class Match:
+    """A query result: a token span and, for sentence queries, its phrases"""
+    def __init__(self, words: list[Word], phrases: list[Phrase]=None):
+        self.words = words
+        self.phrases = phrases
+
+    def __repr__(self):
+        return f'Match(words={self.words}, phrases={self.phrases})'
+
+    def pack(self):
+        words = [(word.word, word.text, pack(word.features)) for word in self.words]
+        if self.phrases is None:
+            return words, None
+
+        phrases = []
+        start = 0
+        for phrase in self.phrases:
+            end = start + len(phrase.words)
+            phrases.append((start, end, pack(phrase.features), phrase.base))
+            start = end
+
+        return words, phrases
+
+    @staticmethod
+    def unpack(record):
+        words, phrases = record
+        words = [Word(word, text, unpack(features)) for word, text, features in words]
+        if phrases is None:
+            return Match(words)
+
+        result = []
+        for start, end, features, base in phrases:
+            phrase = Phrase()
+            phrase.words = [word.text for word in words[start:end]]
+            phrase.features = unpack(features)
+            phrase.base = base
+            result.append(phrase)
+
+        return Match(words, result)
+
+
+class ResultSet:
+    magic = b'TRMR'
+    version = 1
+
+    @staticmethod
+    def write(path, conversations: list[Conversation]):
+        with open(path, 'wb') as f:
+            f.write(ResultSet.magic + bytes([ResultSet.version]))
+            for conversation in conversations:
+                turns = []
+                for turn in conversation.turns:
+                    lines = []
+                    for n, (t, v) in turn.text:
+                        if isinstance(v, Match):
+                            lines.append((n, TokenType.result, v.pack()))
+                        else:
+                            lines.append((n, t, v))
+
+                    turns.append((turn.speaker, lines))
+
+                pickle.dump((conversation.document, conversation.date, turns), f, protocol=pickle.HIGHEST_PROTOCOL)
+                yield conversation
+
+    @staticmethod
+    def read(path):
+        with open(path, 'rb') as f:
+            header = f.read(len(ResultSet.magic) + 1)
+            if header[:-1] != ResultSet.magic or header[-1] != ResultSet.version:
+                raise ValueError(f'{path} is not a version {ResultSet.version} result set')
+
+            while True:
+                try:
+                    document, date, turns = pickle.load(f)
+                except EOFError:
+                    return
+
+                conversation = Conversation(document, date)
+                for speaker, lines in turns:
+                    turn = Turn(speaker)
+                    for n, t, v in lines:
+                        if t == TokenType.result:
+                            v = Match.unpack(v)
+
+                        turn.text.append((n, (t, v)))
+
+                    conversation.add_turn(turn)
+
+                yield conversation
+
+
+def present(query, conversations: list[Conversation]):
+    for conversation in conversations:
+        for turn in conversation.turns:
+            turn.text = [(n, (t, query.present(v) if isinstance(v, Match) else v)) for n, (t, v) in turn.text]
+
+        yield conversation
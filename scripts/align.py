@@ -1,8 +1,12 @@
 import csv
 from dataclasses import dataclass
+import os
 import sys
 import argparse
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import Metrics
+
 
 @dataclass
 class Annotation:
@@ -76,8 +80,11 @@ parser = argparse.ArgumentParser(description="Align and summarize linguistic ann
 parser.add_argument('-k', '--key', type=int)
 parser.add_argument('-g', '--gloss', type=int)
 parser.add_argument('-s', '--summary', action='store_true', help='Print summary of annotations')
+parser.add_argument('--metrics', help='Write a JSON metrics record to this file')
 args = parser.parse_args()
 
+metrics = Metrics('align') if args.metrics else None
+
 if args.summary:
     result = Summary()
 else:
@@ -91,6 +98,9 @@ for i, data in enumerate(csv.reader(sys.stdin)):
     gloss, *utterance = data[args.gloss:]
     utterance = ','.join(utterance).split()
     gloss = gloss.split('/')
+    if metrics:
+        metrics.count('utterances')
+        metrics.count('words', len(utterance))
 
     for word in zip(utterance, zip(*chunk(gloss, len(utterance))), strict=True):
         text, labels = word
@@ -104,3 +114,5 @@ for i, data in enumerate(csv.reader(sys.stdin)):
         result.add_label(id, text, label)
 
 result.write()
+if metrics:
+    metrics.write(args.metrics)
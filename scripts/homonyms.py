@@ -0,0 +1,42 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from structure.morphology import MorphologyGraph
+
+
+parser = argparse.ArgumentParser(description="Time word form analysis as homonyms are redefined in a grammar.")
+parser.add_argument('-r', '--redefinitions', type=int, nargs='+', default=[0, 10, 100, 1000, 10000])
+parser.add_argument('-n', '--lookups', type=int, default=10000)
+args = parser.parse_args()
+
+
+def build(redefinitions):
+    # A pronoun paradigm, then one homonym of 'ia' per redefinition
+    graph = MorphologyGraph(size=0)
+    for key, gloss in [('au', 'pron.1s'), ('koe', 'pron.2s'), ('ia', 'pron.3s'), ('tou', '-p'), ('tā', 'pron.1n')]:
+        graph.add_node(key, gloss)
+
+    graph.add_edge('$', 'au', 'items')
+    graph.add_edge('$', 'koe', 'items')
+    graph.add_edge('$', 'ia', 'items')
+    graph.add_edge('$', 'tou', 'suffixes')
+    graph.add_edge('tou', 'tā', 'items')
+    for i in range(redefinitions):
+        graph.add_node('ia', f'dem.{i}')
+        graph.add_edge('$', 'ia', 'items')
+
+    return graph
+
+
+words = ['au', 'koe', 'tātou', 'kāinga']
+print('redefinitions', 'microseconds/lookup', sep=',')
+for redefinitions in args.redefinitions:
+    graph = build(redefinitions)
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        graph.gloss_affixes(words[i % len(words)])
+
+    print(redefinitions, f'{(time.perf_counter() - start) / args.lookups * 1e6:.1f}', sep=',')
@@ -0,0 +1,37 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+parser = argparse.ArgumentParser(description="Time a query at increasing worker counts, checking output is unchanged.")
+parser.add_argument('-m', '--module', default='sentence.query')
+parser.add_argument('-j', '--jobs', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+parser.add_argument('-r', '--repeat', type=int, default=1)
+parser.add_argument('query', nargs=argparse.REMAINDER, help='Query arguments, after --')
+args = parser.parse_args()
+
+query = [arg for arg in args.query if arg != '--']
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+expected = None
+baseline = None
+print('jobs', 'seconds', 'speedup', 'efficiency', sep=',')
+for jobs in args.jobs:
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', args.module, *query, '-j', str(jobs)], env=env, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+
+    if expected is None:
+        expected = result.stdout
+    elif result.stdout != expected:
+        print(f'Output with {jobs} workers differs from {args.jobs[0]} workers', file=sys.stderr)
+        sys.exit(1)
+
+    seconds = min(times)
+    baseline = baseline or seconds * args.jobs[0]
+    print(jobs, f'{seconds:.2f}', f'{baseline / seconds:.2f}', f'{baseline / seconds / jobs:.2f}', sep=',')
@@ -1,54 +1,223 @@
+from collections import OrderedDict
+import hashlib
 import numpy as np
 from content import Word
 
 
+def signature(lexicon):
+    """Content hash identifying a lexicon version across runs"""
+    digest = hashlib.sha256()
+    for signifier, is_prefix, expectation, effect, override in lexicon:
+        digest.update(repr((signifier, is_prefix, expectation.tobytes(), effect.tobytes(), override.tobytes())).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+class Entry:
+    def __init__(self, index, signifier, is_prefix, expectation, effect, override):
+        self.index = index
+        self.signifier = signifier
+        self.is_prefix = is_prefix
+        self.expectation = expectation
+        self.effect = effect
+        self.keep = ~override
+        self.expects = bool(np.any(expectation))
+
+
+class Node:
+    def __init__(self):
+        self.children: dict[str, 'Node'] = {}
+        self.entries: list[Entry] = []
+
+
+class LexiconIndex:
+    """
+    Prefix trie over prefix signifiers and a table of whole signifiers,
+    preserving lexicon order where signifiers overlap.
+    """
+    def __init__(self, lexicon):
+        self.root = Node()
+        self.entries: list[Entry] = []
+        self.signifiers: dict[str, Entry] = {}
+        for i, item in enumerate(lexicon):
+            entry = Entry(i, *item)
+            self.entries.append(entry)
+            self.signifiers.setdefault(entry.signifier, entry)
+            if not entry.is_prefix:
+                continue
+
+            node = self.root
+            for c in entry.signifier:
+                node = node.children.setdefault(c, Node())
+
+            node.entries.append(entry)
+
+    def prefixes(self, word: str):
+        text = word.lower()
+        if len(text) != len(word):
+            return [e for e in self.entries if e.is_prefix and word[:len(e.signifier)].lower() == e.signifier]
+
+        node = self.root
+        found = list(node.entries)
+        for c in text:
+            node = node.children.get(c)
+            if not node:
+                break
+
+            found += node.entries
+
+        if len(found) > 1:
+            found.sort(key=lambda entry: entry.index)
+
+        return found
+
+    def get(self, stem: str):
+        return self.signifiers.get(stem.lower())
+
+
+class Analyses:
+    """Bounded LRU cache of word form analyses"""
+    def __init__(self, size=65536):
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, word):
+        item = self.items.get(word)
+        if item is None:
+            self.misses += 1
+            return None
+
+        self.items.move_to_end(word)
+        self.hits += 1
+        return item
+
+    def put(self, word, item):
+        self.items[word] = item
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class Lexicon(list):
+    """Lexicon entries, compiled once per version into a LexiconIndex"""
+    def __init__(self, entries=(), size=65536):
+        super().__init__(entries)
+        self.version = 0
+        self.index = None
+        self.compiled = -1
+        self.analyses = Analyses(size)
+
+    def __reduce__(self):
+        return Lexicon, (list(self), self.analyses.size)
+
+    def compile(self):
+        if self.compiled != self.version:
+            self.index = LexiconIndex(self)
+            self.analyses.clear()
+            self.compiled = self.version
+
+        return self.index
+
+
+def _mutator(name):
+    method = getattr(list, name)
+    def mutate(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    return mutate
+
+
+for _name in ['append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse', '__setitem__', '__delitem__', '__iadd__', '__imul__']:
+    setattr(Lexicon, _name, _mutator(_name))
+
+
 class Header:
     def __init__(self, lexicon):
         self.lexicon = lexicon
+        if not isinstance(lexicon, Lexicon):
+            self._index = LexiconIndex(lexicon)
+            self._analyses = Analyses()
 
-    def enter(self, word: str):
-        for signifier, is_prefix, expectation, effect, override in self.lexicon:
-            if not is_prefix:
-                continue
+    @property
+    def index(self) -> LexiconIndex:
+        if isinstance(self.lexicon, Lexicon):
+            return self.lexicon.compile()
 
-            # Identify a valid signifier
-            prefix = word[:len(signifier)]
-            if prefix.lower() != signifier:
-                continue
+        return self._index
+
+    @property
+    def analyses(self) -> Analyses:
+        if isinstance(self.lexicon, Lexicon):
+            return self.lexicon.analyses
+
+        return self._analyses
+
+    def analyse(self, word: str):
+        """Return the stem, prefix features and word features of a word form"""
+        index = self.index
+        analyses = self.analyses
+        item = analyses.get(word)
+        if item is None:
+            stem, prefix_features = self.enter(word, index)
+            word_features = self.match(prefix_features, stem, index)
+            item = stem, prefix_features, word_features, word_features is prefix_features
+            analyses.put(word, item)
+
+        # Callers update features in place, so return copies (sharing storage where match did)
+        stem, prefix_features, word_features, shared = item
+        prefix_features = np.copy(prefix_features)
+        return stem, prefix_features, prefix_features if shared else np.copy(word_features)
+
+    def enter(self, word: str, index: LexiconIndex=None):
+        index = index or self.index
+        stems = {}
+        for entry in index.prefixes(word):
+            effect = entry.effect
+            stem = word[len(entry.signifier):]
+            if entry.expects:
+                # Build full prefix, taking account of expected stem semantics
+                if stem not in stems:
+                    stems[stem] = self.enter(stem, index)
+
+                stem, result = stems[stem]
+                effect = effect | result
+
+                # Ensure expectations are satisfied
+                if np.any(entry.expectation & ~effect):
+                    continue
+
+            return stem, effect & entry.keep
 
-            # Build full prefix, taking account of expected stem semantics
-            effect = np.copy(effect)
-            stem = word[len(signifier):]
-            if np.any(expectation):
-                stem, result = self.enter(stem)
-                effect |= result
-            
-            # Ensure expectations are satisfied
-            if not np.any(expectation & ~effect):
-                return stem, effect & ~override
-        
         return word, np.copy(Word.features.none)
 
-    def match(self, conditions, stem: str):
+    def match(self, conditions, stem: str, index: LexiconIndex=None):
         if not stem:
             return conditions
-        
-        for signifier, _, expectation, effect, override in self.lexicon:
-            # Identify a valid signifier
-            if stem.lower() != signifier:
-                continue
 
-            # Reject signifier if it has no expectations (is not a clitic)
-            if not np.any(expectation):
-                return np.copy(Word.features.none)
-
-            # Reject signifier if it does not match expectations
-            if np.any(expectation & ~conditions):
-                return np.copy(Word.features.none)
-            
-            # Build full word
-            effect = np.copy(effect)
-            effect |= conditions
-            return effect & ~override
-        
-        return np.copy(Word.features.none)
+        # Identify a valid signifier
+        entry = (index or self.index).get(stem)
+        if not entry:
+            return np.copy(Word.features.none)
+
+        # Reject signifier if it has no expectations (is not a clitic)
+        if not entry.expects:
+            return np.copy(Word.features.none)
+
+        # Reject signifier if it does not match expectations
+        if np.any(entry.expectation & ~conditions):
+            return np.copy(Word.features.none)
+
+        # Build full word
+        return (entry.effect | conditions) & entry.keep
@@ -0,0 +1,148 @@
+import numpy as np
+
+from cache import ResultCache
+from content import Word
+from corpus import Conversation, TokenType
+from files import FileReader
+from results import pack, unpack
+from sentence.header import signature
+from sentence.parser import Phrase, Sentence
+
+
+class Segmentation(list):
+    """Words of a content line, with stored sentence and phrase spans"""
+    def __init__(self, words: list[Word], sentences):
+        super().__init__(words)
+        self.sentences = sentences
+
+    def read(self):
+        for start, _, phrases in self.sentences:
+            result = []
+            for s, e, features, base in phrases:
+                phrase = Phrase()
+                phrase.words = [self[k].text for k in range(start + s, start + e)]
+                phrase.features = unpack(features)
+                phrase.base = base
+                result.append(phrase)
+
+            yield start, result
+
+
+class PhraseIndex:
+    """
+    Postings of consecutive phrase feature masks within each sentence,
+    up to size phrases, to (line, phrase offset) pairs of one document.
+    Postings are keyed by length, then by the mask of each phrase in turn.
+    """
+    size = 3
+    version = 2
+
+    def __init__(self, layer: dict):
+        self.postings: dict[int, dict] = {}
+        self.exact = pack(np.ones(len(Word.features.none), dtype=bool))
+        for n, sentences in layer.items():
+            offset = 0
+            for _, _, phrases in sentences:
+                masks = [features for _, _, features, _ in phrases]
+                for i in range(len(masks)):
+                    for k in range(i + 1, min(i + self.size, len(masks)) + 1):
+                        node = self.postings.setdefault(k - i, {})
+                        for mask in masks[i:k-1]:
+                            node = node.setdefault(mask, {})
+
+                        node.setdefault(masks[k-1], []).append((n, offset + i))
+
+                offset += len(masks)
+
+    def find(self, terms):
+        nodes = [self.postings.get(len(terms), {})]
+        for on, off in terms:
+            if on | off == self.exact:
+                # Every feature is fixed, so only one mask can match
+                nodes = [node[on] for node in nodes if on in node]
+            else:
+                nodes = [child for node in nodes for mask, child in node.items() if mask & on == on and not mask & off]
+
+        return {n for postings in nodes for n, _ in postings}
+
+    def lines(self, terms, end):
+        """Lines which may contain the (on, off) mask terms, in order, within end phrases"""
+        if len(terms) > end:
+            return set()
+
+        # Terms must match consecutive phrases
+        if len(terms) == end:
+            return self.find(terms[:self.size])
+
+        lines = None
+        for term in terms:
+            found = self.find([term])
+            lines = found if lines is None else lines & found
+
+        return lines
+
+
+class PhraseLayer:
+    def __init__(self, lexicon, cache: ResultCache=None):
+        self.lexicon = lexicon
+        self.cache = cache
+        self.signature = signature(lexicon)
+        self.sentence = Sentence(lexicon)
+
+    def segment(self, words: list[Word]):
+        sentences = []
+        for start, end, phrases in self.sentence.segment(words):
+            packed = []
+            s = 0
+            for phrase in phrases:
+                e = s + len(phrase.words)
+                packed.append((s, e, pack(phrase.features), phrase.base))
+                s = e
+
+            sentences.append((start, end, packed))
+
+        return sentences
+
+    def index(self, reader: FileReader, label) -> PhraseIndex:
+        """Stored phrase index of a document, if any"""
+        if not self.cache or not isinstance(reader, FileReader):
+            return None
+
+        key = self.cache.key('ngrams', PhraseIndex.version, self.signature, reader.name, label)
+        return self.cache.get(key, reader.fingerprint(label))
+
+    def annotate(self, reader: FileReader, label, conversations: list[Conversation], lines: set=None):
+        stored = None
+        if self.cache and isinstance(reader, FileReader):
+            key = self.cache.key('phrases', self.signature, reader.name, label)
+            fingerprint = reader.fingerprint(label)
+            stored = self.cache.get(key, fingerprint)
+
+        # A layer built from candidate lines alone would be stored incomplete
+        if stored is None:
+            lines = None
+
+        layer = stored or {}
+        for conversation in conversations:
+            for turn in conversation.turns:
+                for i, (n, (t, v)) in enumerate(turn.text):
+                    if t != TokenType.content:
+                        continue
+
+                    # Lines outside the index candidates cannot match
+                    if lines is not None and n not in lines:
+                        turn.text[i] = n, (t, Segmentation(v, []))
+                        continue
+
+                    sentences = layer.get(n)
+                    if sentences is None:
+                        sentences = self.segment(v)
+                        layer[n] = sentences
+
+                    turn.text[i] = n, (t, Segmentation(v, sentences))
+
+            yield conversation
+
+        if self.cache and stored is None and isinstance(reader, FileReader):
+            self.cache.put(key, fingerprint, layer)
+            self.cache.put(self.cache.key('ngrams', PhraseIndex.version, self.signature, reader.name, label), fingerprint, PhraseIndex(layer))
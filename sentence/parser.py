@@ -1,7 +1,7 @@
 import numpy as np
 
 from content import Feature, Word
-from sentence.header import Header
+from sentence.header import Header, Lexicon
 
 
 alienable = Word.features.possessive + Word.features.alienable
@@ -15,7 +15,7 @@ personal = Word.features.determiner + Word.features.personal
 
 stop = Word.features.pause + Word.features.stop
 
-lexicon = [
+lexicon = Lexicon([
     ('ku', False, Word.features.possessive, Word.features.personal + Word.features.speaker, Word.features.none),
     ('u', False, Word.features.possessive, Word.features.personal + Word.features.listener, Word.features.none),
     ('na', False, Word.features.possessive, Word.features.personal, Word.features.none),
@@ -81,7 +81,7 @@ lexicon = [
     ('rā', True, Word.features.demonstrative, Word.features.none, Word.features.none),
     ('nei', True, Word.features.demonstrative, Word.features.none, Word.features.none),
     ('nā', True, Word.features.demonstrative, Word.features.none, Word.features.none),
-]
+])
 
 
 class Phrase:
@@ -149,15 +149,26 @@ class Sentence:
         return Phrase()
 
     
-    def read(self, words: list[Word]):
+    def reset(self):
+        self.phrases = []
+
+    def segment(self, words: list[Word]):
+        """Read successive sentences from one word buffer, yielding their spans and phrases"""
+        start = 0
+        while start < len(words):
+            self.reset()
+            end = min(self.read(words, start) + 1, len(words))
+            yield start, end, self.phrases
+            start = end
+
+    def read(self, words: list[Word], start=0):
         buffer = Phrase()
         last = Word.features.none
-        for i, text in enumerate(words):
+        # Index from start rather than skipping to it, so segmenting a line stays linear
+        indexed = ((i, words[i]) for i in range(start, len(words))) if start else enumerate(words)
+        for i, text in indexed:
             # Fetch prefix semantics and apply punctuation
-            signifier = text.word
-            stem, prefix_features = self.header.enter(signifier)
-
-            word_features = self.header.match(prefix_features, stem)
+            _, prefix_features, word_features = self.header.analyse(text.word)
 
             # Incorporate determiner via pronoun unless previously specified
             if np.any(word_features & Word.features.pronoun) and not np.any(last & Word.features.determiner):
@@ -1,12 +1,27 @@
 import argparse
+import sys
+import numpy as np
 from content import Word
 from corpus import Conversation, TokenType
+from counts import BaseCounts
+from files import FileReader
+from progress import QueryTimeout
 from query import FeatureQuery, TextQuery
+from results import Match, pack
+from sentence.header import Header, signature
+from sentence.layer import PhraseLayer, Segmentation
 from sentence.parser import Phrase, Sentence, lexicon
-from mbc import display, parser, run
+from mbc import display, open_cache, open_metrics, open_profiler, open_progress, open_sampler, parser, run, write_metrics
 from summary import ConversationFormatter
 
 
+def following(mask):
+    """Index of the next True entry at or after each position, padded with len(mask)"""
+    n = len(mask)
+    index = np.where(mask, np.arange(n), n)
+    return np.append(np.minimum.accumulate(index[::-1])[::-1], [n, n])
+
+
 class PhraseFormatter(ConversationFormatter):
     def print_text(self, text):
         return text
@@ -20,43 +35,123 @@ class SentenceQuery(TextQuery):
         self.base = base
         self.text = text
         self.format = format
+        self.materialize = False
+        self.layer: PhraseLayer = None
+        self.indexed = False
+        self.phrases = 0
+        self.sentence = Sentence(lexicon)
+
+    def key(self):
+        features = tuple(term.key() for term in self.features)
+        return 'sentence', signature(self.lexicon), features, self.end, bool(self.base), bool(self.text), self.format, self.materialize
+
+    def counters(self):
+        analyses = self.lexicon.analyses
+        return {'phrases': self.phrases, 'analysis_hits': analyses.hits, 'analysis_misses': analyses.misses}
+
+    def add_counters(self, counters: dict):
+        analyses = self.lexicon.analyses
+        self.phrases += counters['phrases']
+        analyses.hits += counters['analysis_hits']
+        analyses.misses += counters['analysis_misses']
+
+    def match_phrases(self, phrases: list[Phrase], offsets, bounds):
+        """
+        Match feature sequences over the phrases of a line as a feature matrix.
+        offsets holds the word offset of each phrase (and of the line end), and
+        bounds the end of the sentence containing each phrase.
+        """
+        if not phrases:
+            return
+
+        matrix = np.array([phrase.features for phrase in phrases])
+        starts = np.arange(len(phrases))
+        ends = np.minimum(starts + self.end, bounds)
+        current = starts
+        if self.features:
+            terms = [term.match_matrix(matrix) for term in self.features]
+            starts = np.flatnonzero(terms[0])
+            ends = ends[starts]
+            current = starts
+
+            # Advance each candidate to the next phrase matching each subsequent term
+            for term in terms[1:]:
+                current = following(term)[current + 1]
+
+        matched = current < ends
+        for i, j in zip(starts[matched], ends[matched]):
+            yield (offsets[i], offsets[j]), phrases[i:j]
+
+    def sentences(self, words: list[Word]):
+        if isinstance(words, Segmentation):
+            return words.read()
+
+        return ((start, phrases) for start, _, phrases in self.sentence.segment(words))
+
+    def match(self, sentences):
+        phrases, offsets, bounds = [], [], []
+        offset = 0
+        for start, sentence in sentences:
+            offset = start
+            for phrase in sentence:
+                offsets.append(offset)
+                offset += len(phrase.words)
+
+            phrases += sentence
+            bounds += [len(phrases)] * len(sentence)
+
+        offsets.append(offset)
+        self.phrases += len(phrases)
+        return self.match_phrases(phrases, offsets, bounds)
 
-    def match_buffer(self, buffer: list[Phrase]):
-        queries = [i for i in self.features]
-        for p in buffer:
-            if queries and queries[0].match_word(p):
-                queries.pop(0)
-            
-            if not queries:
-                return True
+    def candidates(self, reader: FileReader, label):
+        """Lines of a document which may match, from its phrase index, or None to read all"""
+        if not self.indexed or not self.features:
+            return None
+
+        index = self.layer.index(reader, label)
+        if index is None:
+            return None
+
+        terms = [(pack(on), pack(off)) for on, off in (term.features for term in self.features)]
+        return index.lines(terms, self.end)
+
+    def annotate(self, reader: FileReader, label, conversations: list[Conversation]):
+        if not self.layer:
+            return conversations
+
+        lines = self.candidates(reader, label)
+        if lines is not None and not lines:
+            return iter(())
+
+        return self.layer.annotate(reader, label, conversations, lines)
 
     def apply(self, type, words: list[Word]):
-        if not type == TokenType.content:
+        if type == TokenType.result:
+            matches = self.match([(0, words.phrases)])
+            words = words.words
+        elif type == TokenType.content:
+            matches = self.match(self.sentences(words))
+        else:
             return []
-        
-        result = []
-        while len(words):
-            sentence = Sentence(self.lexicon)
-            n = sentence.read(words)
-            
-            for i, phrase in enumerate(sentence.phrases):
-                if self.features and not self.features[0].match_word(phrase):
-                    continue
-
-                buffer = sentence.phrases[i:i+self.end]
-                if self.match_buffer(buffer):
-                    if self.format & 2:
-                        result.append(buffer)
-                    elif self.base:
-                        result.append([self.format_text(p.base) for p in buffer])
-                    elif self.text:
-                        result.append([self.format_text(w) for p in buffer for w in p.words])
-                    else:
-                        result.append(' '.join(' '.join(p.words) for p in buffer))
-            
-            words = words[n+1:]
-
-        return result
+
+        if self.materialize:
+            return [Match(words[a:b], buffer) for (a, b), buffer in matches]
+
+        return [self.format_buffer(buffer) for _, buffer in matches]
+
+    def present(self, match: Match):
+        return self.format_buffer(match.phrases)
+
+    def format_buffer(self, buffer: list[Phrase]):
+        if self.format & 2:
+            return buffer
+        elif self.base:
+            return [self.format_text(p.base) for p in buffer]
+        elif self.text:
+            return [self.format_text(w) for p in buffer for w in p.words]
+        else:
+            return ' '.join(' '.join(p.words) for p in buffer)
     
     def format_text(self, word):
         if not word:
@@ -80,17 +175,62 @@ if __name__ == '__main__':
     parser.add_argument('-e', '--end', type=int, default=1)
     parser.add_argument('-F', '--format', type=int, default=0)
     parser.add_argument('-b', '--base', action=argparse.BooleanOptionalAction)
-    parser.add_argument('-T', '--text', action=argparse.BooleanOptionalAction)    
+    parser.add_argument('-T', '--text', action=argparse.BooleanOptionalAction)
+    parser.add_argument('-L', '--layer', action=argparse.BooleanOptionalAction, help='Use precomputed phrases, stored in the cache')
+    parser.add_argument('-k', '--counts', type=int, nargs='*', help='Count base forms at phrase positions (all if none given)')
+    parser.add_argument('--group', choices=['speaker', 'document'], help='Group base form counts')
+    parser.add_argument('--top', type=int, help='Keep approximate counts of at most this many base forms per position')
+    parser.add_argument('--tables', help='Write count tables to this directory')
+    parser.add_argument('-I', '--index', action=argparse.BooleanOptionalAction, help='Skip lines using the phrase index, stored with the phrase layer')
 
     args = parser.parse_args()
+    if (args.layer or args.index) and not args.cache:
+        parser.error('--layer and --index store phrases in the cache, so need --cache')
 
-    query = SentenceQuery(lexicon, args.features, args.end, args.base, args.text, args.format)
+    counting = args.counts is not None
+    query = SentenceQuery(lexicon, args.features, args.end, args.base or counting, args.text, args.format)
     formatter = PhraseFormatter(args.format)
+    cache = open_cache(args)
+    progress = open_progress(args)
+    if args.layer or args.index:
+        query.layer = PhraseLayer(lexicon, cache)
+        query.indexed = bool(args.index)
+    sampler = open_sampler(args)
+    metrics = open_metrics(args, 'sentence.query')
+    profiler = open_profiler(args, 'sentence', query)
+    if profiler:
+        profiler.wrap(Header, 'analyse', 'header')
+        profiler.wrap(Sentence, 'read', 'sentence')
     
-    conversations = run(args, query)
-    if args.base:
-        show_base(conversations)
-    elif args.text:
-        show_base(conversations)
-    else:
-        display(args, conversations, formatter)
+    conversations = run(args, query, cache, progress, sampler, profiler)
+    try:
+        if args.summary or sampler:
+            display(args, conversations, formatter, sampler)
+        elif counting:
+            counts = BaseCounts(args.counts, args.group, args.top).count(conversations)
+            if args.tables:
+                counts.write(args.tables)
+            else:
+                counts.print()
+        elif args.base:
+            show_base(conversations)
+        elif args.text:
+            show_base(conversations)
+        else:
+            display(args, conversations, formatter)
+    except (KeyboardInterrupt, QueryTimeout) as e:
+        progress.interrupt(str(e) or 'cancelled')
+
+    sys.stdout.flush()
+    progress.finish()
+    if args.progress:
+        analyses = lexicon.analyses
+        print(f'analyses: {analyses.misses} word forms analysed, {analyses.hit_rate():.1%} hit rate', file=sys.stderr)
+    if cache:
+        cache.report()
+    if profiler:
+        profiler.finish()
+    if metrics:
+        metrics.count('phrases', query.phrases)
+        metrics.cache('analyses', lexicon.analyses.hit_rate())
+        write_metrics(args, metrics, progress, cache)
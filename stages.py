@@ -0,0 +1,149 @@
+import cProfile
+from collections import Counter
+import functools
+import inspect
+import sys
+import time
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.items = 0
+        self.wall = 0.0
+        self.own = 0.0
+        self.cpu = 0.0
+
+
+class Profiler:
+    """
+    Per-stage wall and CPU time, call and item counts. Stages are timed by
+    wrapping functions in place, so nothing is timed unless a profiler is created.
+    """
+    def __init__(self, name, dump=None, stacks=None, file=sys.stderr):
+        self.name = name
+        self.dump = dump
+        self.stacks = stacks
+        self.file = file
+        self.stages: dict[str, Stage] = {}
+        self.frames = []
+        self.collapsed = Counter()
+        self.staged = 0.0
+        self.profile = cProfile.Profile() if dump else None
+        self.start = time.perf_counter(), time.process_time()
+        if self.profile:
+            self.profile.enable()
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = Stage(name)
+            self.stages[name] = stage
+
+        return stage
+
+    def enter(self, name):
+        self.frames.append([name, time.perf_counter(), time.process_time(), 0.0])
+
+    def exit(self, stage: Stage, items):
+        name, wall, cpu, child = self.frames.pop()
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+
+        # Count recursive stages once, at their outermost frame
+        if all(frame[0] != name for frame in self.frames):
+            stage.wall += wall
+            stage.cpu += cpu
+
+        stage.own += wall - child
+        stage.items += items
+        self.collapsed[';'.join([self.name] + [frame[0] for frame in self.frames] + [name])] += wall - child
+        if self.frames:
+            self.frames[-1][3] += wall
+        else:
+            self.staged += wall
+
+    def wrap(self, owner, attribute, name=None, items=None):
+        """
+        Time calls to owner.attribute (a class or module) as a stage.
+        items maps the call arguments and result to the number of items processed;
+        generator functions count the items they yield.
+        """
+        function = getattr(owner, attribute)
+        stage = self.stage(name or attribute)
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                stage.calls += 1
+                generator = function(*args, **kwargs)
+                while True:
+                    self.enter(stage.name)
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        self.exit(stage, 0)
+                        return
+                    except BaseException:
+                        self.exit(stage, 0)
+                        raise
+
+                    self.exit(stage, 1)
+                    yield item
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                stage.calls += 1
+                self.enter(stage.name)
+                result = None
+                try:
+                    result = function(*args, **kwargs)
+                    return result
+                finally:
+                    self.exit(stage, items(args, result) if items else 1)
+
+        setattr(owner, attribute, wrapper)
+
+    def reset(self):
+        """Clear stage totals, keeping the stages wrapped functions time"""
+        for stage in self.stages.values():
+            stage.calls = stage.items = 0
+            stage.wall = stage.own = stage.cpu = 0.0
+
+        self.collapsed.clear()
+
+    def totals(self):
+        stages = {name: (stage.calls, stage.items, stage.wall, stage.own, stage.cpu) for name, stage in self.stages.items()}
+        return stages, dict(self.collapsed)
+
+    def add(self, stages: dict, collapsed: dict):
+        """Add stage totals from another process, such as a query worker"""
+        for name, (calls, items, wall, own, cpu) in stages.items():
+            stage = self.stage(name)
+            stage.calls += calls
+            stage.items += items
+            stage.wall += wall
+            stage.own += own
+            stage.cpu += cpu
+
+        self.collapsed.update(collapsed)
+
+    def finish(self):
+        if self.profile:
+            self.profile.disable()
+            self.profile.dump_stats(self.dump)
+
+        wall = time.perf_counter() - self.start[0]
+        cpu = time.process_time() - self.start[1]
+        if self.stacks:
+            self.collapsed[self.name] += wall - self.staged
+            with open(self.stacks, 'w') as f:
+                for stack, seconds in sorted(self.collapsed.items()):
+                    if seconds > 0:
+                        print(stack, round(seconds * 1e6), file=f)
+
+        print(f'{"stage":<12}{"calls":>10}{"items":>12}{"wall s":>10}{"self s":>10}{"cpu s":>10}', file=self.file)
+        for stage in self.stages.values():
+            print(f'{stage.name:<12}{stage.calls:>10}{stage.items:>12}{stage.wall:>10.3f}{stage.own:>10.3f}{stage.cpu:>10.3f}', file=self.file)
+
+        print(f'{"total":<12}{"":>10}{"":>12}{wall:>10.3f}{"":>10}{cpu:>10.3f}', file=self.file)
@@ -2,9 +2,13 @@ import argparse
 import csv
 import sys
 
+from metrics import Metrics
+from stages import Profiler
 from structure.formal import SyntaxBuilder
-from structure.functional import Reviewer, count
+from structure.functional import InterpretationNode, Interpreter, Organiser, Reviewer, count
 from structure.morphology import MorphologyBuilder, MorphologyGraph
+from structure.snapshot import Snapshot
+from structure.vocabulary import Vocabulary, normalise, signature
 from structure.writer import DotWriterFactory, GlossWriterFactory, InterpretationWriter
 
 
@@ -22,6 +26,30 @@ def read_line(header: list[str]):
         yield ','.join(utterance), *context
 
 
+def interpretations(node: InterpretationNode):
+    if isinstance(node, Organiser):
+        return interpretations(node.left) + interpretations(node.right)
+
+    return 1
+
+
+def open_profiler(args):
+    if not (args.profile or args.profile_dump or args.profile_stacks):
+        return None
+
+    profiler = Profiler('structure', args.profile_dump, args.profile_stacks)
+    profiler.wrap(SyntaxBuilder, 'parse', 'grammar')
+    profiler.wrap(MorphologyBuilder, 'parse', 'morphology')
+    profiler.wrap(MorphologyGraph, 'gloss_affixes', 'gloss')
+    profiler.wrap(Reviewer, 'read', 'review', lambda args, _: len(args[1].split()))
+    profiler.wrap(Interpreter, 'extend', 'interpret')
+    profiler.wrap(Interpreter, 'structure', 'structure')
+    profiler.wrap(Interpreter, 'prune', 'prune')
+    profiler.wrap(Interpreter, 'annotate', 'annotate')
+    profiler.wrap(InterpretationWriter, 'write', 'output')
+    return profiler
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Process linguistic input file.")
     parser.add_argument('-g', '--grammar', help="Path to grammar")
@@ -33,21 +61,37 @@ if __name__ == '__main__':
     parser.add_argument('-L', '--lower', action='store_true')
     parser.add_argument('-v', '--verbose', action='store_true')
     parser.add_argument('-o', '--output')
+    parser.add_argument('-s', '--snapshot', action='store_true', help='Load the grammar from <grammar>.snapshot, compiling it when stale')
+    parser.add_argument('-w', '--beam', type=int, default=0, help='Keep at most this many interpretations after each word, or all if 0. Ties may be broken differently from reading all')
+    parser.add_argument('-B', '--batch', action='store_true', help='Analyse each distinct word once before interpreting')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Analyse words across this many worker processes')
+    parser.add_argument('-V', '--vocabulary', help='Reuse word analyses from this file, implies --batch')
+    parser.add_argument('--cache-size', type=int, default=65536, help='Number of word form analyses to keep')
+    parser.add_argument('--metrics', help='Write a JSON metrics record to this file')
+    parser.add_argument('--profile', action='store_true', help='Report time spent in each stage')
+    parser.add_argument('--profile-dump', help='Write cProfile statistics to this file')
+    parser.add_argument('--profile-stacks', help='Write collapsed stage stacks (for flamegraphs) to this file')
     args = parser.parse_args()
 
-    morphology = MorphologyGraph()
-    syntax_builder = SyntaxBuilder()
-    morphology_builder = MorphologyBuilder(morphology, test=args.test)
-    with open(args.grammar, 'r') as f:
-        for line in f.readlines():
-            line = syntax_builder.parse(line)
-            if not line:
-                continue
+    metrics = Metrics('structure') if args.metrics else None
+    profiler = open_profiler(args)
+
+    if args.snapshot and not args.test:
+        syntax_builder, morphology = Snapshot(args.grammar).open(args.cache_size)
+    else:
+        morphology = MorphologyGraph(args.cache_size)
+        syntax_builder = SyntaxBuilder()
+        morphology_builder = MorphologyBuilder(morphology, test=args.test)
+        with open(args.grammar, 'r') as f:
+            for line in f.readlines():
+                line = syntax_builder.parse(line)
+                if not line:
+                    continue
 
-            morphology_builder.parse(line)
+                morphology_builder.parse(line)
     
     out = []
-    reviewer = Reviewer(morphology, syntax_builder, args.annotate)
+    reviewer = Reviewer(morphology, syntax_builder, args.annotate, args.beam)
     if args.gloss:
         writer = GlossWriterFactory()
     else:
@@ -57,8 +101,25 @@ if __name__ == '__main__':
     if args.verbose:
         print(f'Using header: {header}')
     
+    lines = read_line(header)
+    if args.batch or args.vocabulary:
+        lines = list(lines)
+        vocabulary = Vocabulary(morphology, signature(args.grammar))
+        if args.vocabulary:
+            vocabulary.load(args.vocabulary)
+
+        analysed = vocabulary.analyse({normalise(word) for line, *_ in lines for word in line.split()}, args.jobs)
+        if args.vocabulary and analysed:
+            vocabulary.save(args.vocabulary)
+
+        if metrics:
+            metrics.count('types', len(vocabulary.glosses))
+            metrics.count('analysed', analysed)
+
+        reviewer.morphology = vocabulary
+
     out += writer.start(*header)
-    for line, *context in read_line(header):
+    for line, *context in lines:
         if args.verbose:
             print(*context, line, sep=',')
 
@@ -66,14 +127,28 @@ if __name__ == '__main__':
         if args.lower:
             line = line.replace(line[0], line[0].lower(), 1)
 
+        if metrics:
+            metrics.count('utterances')
+            metrics.count('words', len(line.split()))
+
         if args.count:
-            product = count(morphology, line)
+            product = count(reviewer.morphology, line)
             print(*context, product, line, sep=',')
             continue
         
         interpretation = reviewer.read(line, line=id)
+        if metrics:
+            metrics.count('interpretations', interpretations(interpretation))
+
         out += InterpretationWriter(id, writer.create(line, *context)).write(interpretation)
 
     if args.output:
         with open(args.output, 'w') as f:
-            f.writelines(line for line in out)
\ No newline at end of file
+            f.writelines(line for line in out)
+
+    if profiler:
+        profiler.finish()
+
+    if metrics:
+        metrics.cache('glosses', morphology.glosses.hit_rate())
+        metrics.write(args.metrics)
\ No newline at end of file
@@ -1,11 +1,23 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import re
+import weakref
 
 
 @dataclass
 class SyntaxNode(ABC):
     gloss: str
+    # Phrases containing this node, whose cached aggregates depend on it
+    parents: list = field(default_factory=list, init=False, repr=False, compare=False)
+
+    def invalidate(self):
+        """Clear the cached aggregates of every phrase containing this node"""
+        for parent in self.parents:
+            parent = parent()
+            # Phrases above one already cleared are clear too
+            if parent is not None and parent.aggregate:
+                parent.aggregate = None
+                parent.invalidate()
 
     @abstractmethod
     def includes(self, gloss: set):
@@ -15,16 +27,29 @@ class SyntaxNode(ABC):
     def score(self):
         pass
 
+    @abstractmethod
+    def components(self) -> int:
+        pass
+
+    @abstractmethod
+    def words(self) -> int:
+        pass
+
 
 @dataclass
 class Terminal(SyntaxNode):
     text: str
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == 'gloss' and 'parents' in self.__dict__:
+            self.invalidate()
+
     def __str__(self):
         return self.text
 
     def includes(self, gloss):
-        return _split(self.gloss).intersection(gloss)
+        return bool(self.components() & _symbols.components(gloss))
     
     def score(self):
         if self.gloss in {'*'}:
@@ -32,69 +57,130 @@ class Terminal(SyntaxNode):
         
         return 0
 
+    def components(self):
+        return _symbols.gloss(self.gloss)
+
+    def words(self):
+        return 1
+
 
 @dataclass
 class NonTerminal(SyntaxNode):
     left: SyntaxNode
     right: SyntaxNode
+    aggregate: tuple = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for node in (self.left, self.right):
+            if node:
+                node.parents.append(weakref.ref(self))
+
+        self.measure()
 
     def __str__(self):
-        result = []
-        if self.left:
-            result.append(str(self.left))
-        if self.right:
-            result.append(str(self.right))
-        
-        return ' '.join(result)
+        return self.measure()[3]
+
+    def measure(self):
+        """Score, gloss components, word count and text of the phrase"""
+        if self.aggregate:
+            return self.aggregate
+
+        score, components, words, text = 0, _symbols.components([self.gloss]), 0, []
+        for node in (self.left, self.right):
+            if node:
+                score += node.score()
+                components |= node.components()
+                words += node.words()
+                text.append(str(node))
 
-    def includes(self, gloss):
-        if self.gloss in gloss:
-            return True
-        
-        left = self.left.includes(gloss) if self.left else False
-        right = self.right.includes(gloss) if self.right else False
-        return left or right
-    
-    def score(self):
-        left = self.left.score() if self.left else 0
-        right = self.right.score() if self.right else 0
-        score = left + right
         if self.gloss in {'desc', 'dem', '$'}:
             score += 1
         
-        if not self.includes({'*'}):
+        if not components & _symbols.components({'*'}):
             score += 1
 
-        return score
+        self.aggregate = score, components, words, ' '.join(text)
+        return self.aggregate
+
+    def includes(self, gloss):
+        return bool(self.components() & _symbols.components(gloss))
+    
+    def score(self):
+        return self.measure()[0]
+
+    def components(self):
+        return self.measure()[1]
+
+    def words(self):
+        return self.measure()[2]
 
 
 def _split(token):
     return set(re.split(r'[.-]', token))
 
 
+class Symbols:
+    """Gloss components interned as bits, so sets of them compare as integers"""
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.glosses: dict[str, int] = {}
+
+    def components(self, components):
+        bits = 0
+        for component in components:
+            bits |= 1 << self.ids.setdefault(component, len(self.ids))
+
+        return bits
+
+    def gloss(self, gloss):
+        bits = self.glosses.get(gloss)
+        if bits is None:
+            bits = self.glosses[gloss] = self.components(c for c in _split(gloss) if c)
+
+        return bits
+
+
+_symbols = Symbols()
+
+
 class Ranking:
     def __init__(self, ranks: dict[str, set]):
         self.ranks = ranks
+        self.symbols = Symbols()
+        self.outranked = {key: self.symbols.components(outranked) for key, outranked in ranks.items()}
+        self.relation: dict[tuple[str, str], bool] = {}
     
     def outranks(self, antecedent, token):
         if antecedent == '$':
             return True
         
-        outranks = {j for i in _split(antecedent) for j in self.ranks.get(i, {})}
-        return any(outranks.intersection(_split(token)))
+        result = self.relation.get((antecedent, token))
+        if result is None:
+            outranked = 0
+            for component in _split(antecedent):
+                outranked |= self.outranked.get(component, 0)
+
+            result = self.relation[antecedent, token] = bool(outranked & self.symbols.gloss(token))
+
+        return result
 
 class Mapper:
     def __init__(self, sums: list[tuple[set, str]]):
         self.sums = sums
+        self.symbols = Symbols()
+        self.rules = [(self.symbols.components(sum), result) for sum, result in sums]
+        self.results: dict[int, str] = {}
 
     def add(self, antecedent, token):
         if antecedent == '$':
             return
         
-        bag = _split(antecedent).union(_split(token))
-        for sum, result in self.sums:
-            if not sum - bag:
-                return result
+        bag = self.symbols.gloss(antecedent) | self.symbols.gloss(token)
+        if bag not in self.results:
+            # First rule whose components are all in the bag
+            self.results[bag] = next((result for sum, result in self.rules if not sum & ~bag), None)
+
+        return self.results[bag]
             
 
 class Logger(ABC):
@@ -102,24 +188,57 @@ class Logger(ABC):
     def info(self, message, *args):
         pass
 
+class Stack:
+    """Immutable linked stack, so clones share the nodes below where they diverge"""
+    __slots__ = ('head', 'tail', 'size')
+
+    def __init__(self, head: SyntaxNode, tail: 'Stack' = None):
+        self.head = head
+        self.tail = tail
+        self.size = tail.size + 1 if tail else 1
+
+    def __iter__(self):
+        stack = self
+        while stack:
+            yield stack.head
+            stack = stack.tail
+
+
 class Utterance:
     def __init__(self, ranking: Ranking, mapper: Mapper, logger: Logger):
-        self.nodes: list[SyntaxNode] = []
+        self.stack: Stack = None
         self.ranking = ranking
         self.mapper = mapper
         self.logger = logger
 
+    def __len__(self):
+        return self.stack.size if self.stack else 0
+
+    @property
+    def nodes(self) -> list[SyntaxNode]:
+        if not self.stack:
+            return []
+
+        nodes = list(self.stack)
+        nodes.reverse()
+        return nodes
+
     def push(self, node):
         if node.gloss != '#':
-            self.nodes.append(node)
+            self.stack = Stack(node, self.stack)
         
         return self
 
     def peek(self):
-        return self.nodes[-1] if len(self.nodes) else None
+        return self.stack.head if self.stack else None
     
     def pop(self):
-        return self.nodes.pop()
+        if not self.stack:
+            raise IndexError('pop from empty stack')
+
+        node = self.stack.head
+        self.stack = self.stack.tail
+        return node
     
     def merge(self, antecedent, next):
         if not self.peek():
@@ -155,7 +274,7 @@ class Utterance:
     def extend(self, gloss, text):
         self.logger.info('Read %s/%s', text, gloss)
         terminal = Terminal(gloss, text)
-        if not len(self.nodes):
+        if not self.stack:
             return self.push(terminal)
         
         if self.ranking.outranks(self.peek().gloss, terminal.gloss):
@@ -170,7 +289,7 @@ class Utterance:
             logger=logger
         )
 
-        s.nodes = self.nodes.copy()
+        s.stack = self.stack
         return s
     
 
@@ -178,6 +297,7 @@ class SyntaxBuilder:
     def __init__(self):
         self.ranks = {}
         self.sums = []
+        self.grammar = None
     
     def parse(self, line: str):
         line = line.strip()
@@ -188,14 +308,23 @@ class SyntaxBuilder:
         if command[0] == 'r':
             _, key, *outranked = command
             self.ranks[key] = set(outranked)
+            self.grammar = None
         elif command[0] == 's':
             _, gloss, *constituents = command
             self.sums.append((set(constituents), gloss))
+            self.grammar = None
         else:
             return line
     
+    def compile(self):
+        if not self.grammar:
+            self.grammar = Ranking(self.ranks), Mapper(self.sums)
+
+        return self.grammar
+
     def build(self, logger):
+        ranking, mapper = self.compile()
         return Utterance(
-            ranking=Ranking(self.ranks),
-            mapper=Mapper(self.sums),
+            ranking=ranking,
+            mapper=mapper,
             logger=logger)
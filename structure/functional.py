@@ -143,14 +143,101 @@ class Interpreter(InterpretationNode):
         return Interpreter(id=0, utterance=builder.build(logger), context=context)
 
 
+class Beam(InterpretationNode):
+    """
+    Interpretations read in step, keeping at most width of the lowest scoring
+    after each token. Each keeps its depth in the Organiser tree that reading
+    them exhaustively would build, so that tree can be rebuilt to prune them.
+    """
+    def __init__(self, interpreter: Interpreter, width: int):
+        self.interpreters = [(0, interpreter)]
+        self.width = width
+        self.truncated = False
+        self.context = interpreter.context
+        self.logger = interpreter.logger
+
+    def __len__(self):
+        return min(len(interpreter) for _, interpreter in self.interpreters)
+
+    def branches(self, depth, interpreter: Interpreter, text, glosses):
+        # Number and order branches as Interpreter.extend does, left to right
+        id = interpreter.id
+        for gloss in glosses[:-1]:
+            FunctionalLogger(id=id, **self.context).info('Branching interpretations on ambiguous token %s', text)
+            yield depth + 1, interpreter.branch(2 * id).extend(text, gloss)
+            depth, id = depth + 1, 2 * id + 1
+
+        if id != interpreter.id:
+            interpreter = interpreter.branch(id)
+
+        yield depth, interpreter.extend(text, glosses[-1])
+
+    def extend(self, text, *glosses):
+        interpreters = [branch for depth, interpreter in self.interpreters for branch in self.branches(depth, interpreter, text, glosses)]
+        if len(interpreters) > self.width:
+            self.logger.info('Pruning %s of %s interpretations', len(interpreters) - self.width, len(interpreters))
+            kept = sorted(range(len(interpreters)), key=lambda i: interpreters[i][1].score())[:self.width]
+            interpreters = [interpreters[i] for i in sorted(kept)]
+            self.truncated = True
+
+        self.interpreters = interpreters
+        return self
+
+    def score(self):
+        return min(interpreter.score() for _, interpreter in self.interpreters)
+
+    def organise(self, depth, id, interpreters):
+        if len(interpreters) == 1:
+            return interpreters[0][1]
+
+        left, right = [], []
+        for branch in interpreters:
+            d, interpreter = branch
+            (right if interpreter.id >> (d - depth - 1) & 1 else left).append(branch)
+
+        # Subtrees emptied by the beam are left out
+        if not left:
+            return self.organise(depth + 1, 2 * id + 1, right)
+        if not right:
+            return self.organise(depth + 1, 2 * id, left)
+
+        return Organiser(
+            id=id,
+            left=self.organise(depth + 1, 2 * id, left),
+            right=self.organise(depth + 1, 2 * id + 1, right),
+            logger=FunctionalLogger(id=id, **self.context)
+        )
+
+    def prune(self):
+        if not self.truncated:
+            return self.organise(0, 0, self.interpreters).prune()
+
+        # Organiser pruning depends on the whole tree, so once any branch is
+        # dropped keep every interpretation with the lowest score instead
+        score = self.score()
+        return self.organise(0, 0, [branch for branch in self.interpreters if branch[1].score() == score])
+
+    def structure(self):
+        self.interpreters = [(depth, interpreter.structure()) for depth, interpreter in self.interpreters]
+        return self
+
+    def annotate(self):
+        self.interpreters = [(depth, interpreter.annotate()) for depth, interpreter in self.interpreters]
+        return self
+
+
 class Reviewer:
-    def __init__(self, morphology: MorphologyGraph, syntax: SyntaxBuilder, annotate: bool):
+    def __init__(self, morphology: MorphologyGraph, syntax: SyntaxBuilder, annotate: bool, beam: int=None):
         self.morphology = morphology
         self.syntax = syntax
         self.annotate = annotate
+        self.beam = beam
 
     def read(self, text: str, **context):
         interpreter = Interpreter.create(self.syntax, **context)
+        if self.beam:
+            interpreter = Beam(interpreter, self.beam)
+
         for word in text.split():
             glosses = self.morphology.gloss_affixes(word.lower().strip(',.?!"'))
             if not glosses:
@@ -1,5 +1,12 @@
+from collections import OrderedDict
+import hashlib
+from itertools import islice
+import json
+import os
+import re
 import sys
 import argparse
+from metrics import Metrics
 
 class MorphologyNode:
     def __init__(self, gloss: str, *overrides: str):
@@ -8,17 +15,18 @@ class MorphologyNode:
         self.items: dict[str, 'MorphologyNode'] = {}
         self.prefixes: dict[str, 'MorphologyNode'] = {}
         self.suffixes: dict[str, 'MorphologyNode'] = {}
+        self.homonyms: dict[tuple[str, str], list['MorphologyNode']] = {}
 
     def __str__(self):
         lines = []
-        for item in self.items:
-            lines.append(f'item {item} {self.items[item]}')
+        for item, node in self.edges('items'):
+            lines.append(f'item {item} {node}')
         
-        for prefix in self.prefixes:
-            lines.append(f'prefix {prefix} {self.prefixes[prefix]}')
+        for prefix, node in self.edges('prefixes'):
+            lines.append(f'prefix {prefix} {node}')
         
-        for suffix in self.suffixes:
-            lines.append(f'suffix {suffix} {self.suffixes[suffix]}')
+        for suffix, node in self.edges('suffixes'):
+            lines.append(f'suffix {suffix} {node}')
 
         return '\n'.join(lines)
 
@@ -26,6 +34,29 @@ class MorphologyNode:
         getattr(self, type)[key] = node
         return self
 
+    def add_homonym(self, type, key, node):
+        """Add an edge, keeping any existing edge with the same key in its homonym bucket"""
+        current = getattr(self, type).get(key)
+        if current:
+            self.homonyms.setdefault((type, key), []).append(current)
+
+        return self.add_node(type, key, node)
+
+    def get(self, type, key):
+        """Nodes reached by an edge, earlier homonyms first"""
+        node = getattr(self, type).get(key)
+        if not node:
+            return []
+
+        return self.homonyms.get((type, key), []) + [node]
+
+    def edges(self, type):
+        for key, node in getattr(self, type).items():
+            for homonym in self.homonyms.get((type, key), []):
+                yield key, homonym
+
+            yield key, node
+
     def split_word(self, text, i):
         return text[:i], text[i:]
     
@@ -39,19 +70,12 @@ class MorphologyNode:
         return gloss + self.gloss
     
     def get_item(self, text, prefix):
-        item = self.items.get(text)
-        if item:
-            return self.apply_gloss(item.gloss, prefix), item.overrides
+        for item in self.get('items', text):
+            yield self.apply_gloss(item.gloss, prefix), item.overrides
 
     def gloss_affixes(self, text, prefix):
-        homonyms = self.prefixes.get('$')
-        if homonyms:
-            for gloss in homonyms.gloss_affixes(text, prefix):
-                yield gloss
-
-        affixes = self.prefixes if prefix else self.suffixes
-        item = self.get_item(text, prefix)
-        if item:
+        type = 'prefixes' if prefix else 'suffixes'
+        for item in self.get_item(text, prefix):
             yield item
 
         for i in range(1, len(text)):
@@ -60,19 +84,136 @@ class MorphologyNode:
             else:
                 stem, affix = self.split_word(text, i)
 
-            next = affixes.get(affix)
-            if not next:
-                continue
+            for next in self.get(type, affix):
+                for gloss, overrides in next.gloss_affixes(stem, prefix):
+                    yield self.apply_gloss(gloss, prefix, *overrides), overrides
+
+
+class AffixTrie:
+    def __init__(self):
+        self.children: dict[str, 'AffixTrie'] = {}
+        self.affixes: list[MorphologyNode] = []
+        self.items: list[MorphologyNode] = []
+
+    def insert(self, key, type, node):
+        trie = self
+        for c in key:
+            trie = trie.children.setdefault(c, AffixTrie())
+
+        getattr(trie, type).append(node)
+
+
+class MorphologyAnalyser:
+    """
+    Morphology graph compiled into a trie of affixes and items per node and
+    direction, with homonyms sharing a trie entry. A word is read once per
+    direction, visiting each (node, position) pair at most once, and yields the
+    glosses of MorphologyNode.gloss_affixes. Suffixes are read as prefixes of
+    the reversed word.
+    """
+    def __init__(self, root: MorphologyNode):
+        self.root = root
+        self.tries: dict[tuple[MorphologyNode, bool], AffixTrie] = {}
+
+    def compile(self, node: MorphologyNode, prefix: bool):
+        trie = self.tries.get((node, prefix))
+        if trie is None:
+            trie = AffixTrie()
+            for key, item in node.edges('items'):
+                trie.insert(key if prefix else key[::-1], 'items', item)
+
+            for key, next in node.edges('prefixes' if prefix else 'suffixes'):
+                trie.insert(key if prefix else key[::-1], 'affixes', next)
+
+            self.tries[(node, prefix)] = trie
+
+        return trie
+
+    def gloss_affixes(self, text, prefix):
+        word = text if prefix else text[::-1]
+        visited = {}
+
+        def visit(node: MorphologyNode, start):
+            found = visited.get((id(node), start))
+            if found is not None:
+                return found
+
+            found = []
+
+            # Walk the node's trie along the rest of the word, noting affixes that leave a stem
+            trie = self.compile(node, prefix)
+            splits = []
+            i = start
+            while trie and i < len(word):
+                if trie.affixes and i > start:
+                    splits.append((trie.affixes, i))
+
+                trie = trie.children.get(word[i])
+                i += 1
+
+            if trie:
+                for item in trie.items:
+                    found.append((node.apply_gloss(item.gloss, prefix), item.overrides))
+
+            for affixes, i in splits:
+                for next in affixes:
+                    for gloss, overrides in visit(next, i):
+                        found.append((node.apply_gloss(gloss, prefix, *overrides), overrides))
+
+            visited[(id(node), start)] = found
+            return found
+
+        return visit(self.root, 0)
+
+
+class GlossCache:
+    """Bounded LRU cache of the gloss sets of word forms"""
+    def __init__(self, size=65536):
+        self.size = size
+        self.items: OrderedDict[str, set] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, text):
+        glosses = self.items.get(text)
+        if glosses is None:
+            self.misses += 1
+            return None
+
+        self.items.move_to_end(text)
+        self.hits += 1
+        return glosses
 
-            for gloss, overrides in next.gloss_affixes(stem, prefix):
-                yield self.apply_gloss(gloss, prefix, *overrides), overrides
+    def put(self, text, glosses):
+        self.items[text] = glosses
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
 
 
 class MorphologyGraph:
-    def __init__(self):
+    def __init__(self, size=65536):
         self.nodes: dict[str, MorphologyNode] = {
             '$': MorphologyNode('')
         }
+        self.analyser: MorphologyAnalyser = None
+        self.glosses = GlossCache(size)
+        self.generation = 0
+        self.generations: dict[tuple[str, str], int] = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['glosses'] = GlossCache(self.glosses.size)
+        return state
 
     def __str__(self):
         return str(self.get_root())
@@ -81,16 +222,55 @@ class MorphologyGraph:
         return self.nodes['$']
 
     def add_node(self, key, gloss, *overrides):
+        self.analyser = None
+        self.glosses.clear()
         if key in self.nodes:
-            root = self.nodes['$']
-            self.nodes['$'] = MorphologyNode('').add_node('prefixes', '$', root)
+            # Root edges added from now on are homonyms of earlier ones
+            self.generation += 1
         self.nodes[key] = MorphologyNode(gloss, *overrides)
     
     def add_edge(self, source, target, label):
-        self.nodes[source].add_node(label, target, self.nodes[target])
+        self.analyser = None
+        self.glosses.clear()
+        node = self.nodes[source]
+        if source != '$':
+            node.add_node(label, target, self.nodes[target])
+        elif self.generations.get((label, target), self.generation) < self.generation:
+            node.add_homonym(label, target, self.nodes[target])
+        else:
+            node.add_node(label, target, self.nodes[target])
+
+        if source == '$':
+            self.generations[(label, target)] = self.generation
+
+    def compile(self):
+        """Compile the tries of every node affixes reach, rather than as words reach them"""
+        if not self.analyser:
+            self.analyser = MorphologyAnalyser(self.get_root())
+
+        for prefix in [True, False]:
+            nodes = [self.get_root()]
+            while nodes:
+                node = nodes.pop()
+                if (node, prefix) not in self.analyser.tries:
+                    self.analyser.compile(node, prefix)
+                    nodes.extend(next for _, next in node.edges('prefixes' if prefix else 'suffixes'))
+
+    def analyse(self, text):
+        """Distinct glosses of a word form, in the order they are found"""
+        if not self.analyser:
+            self.analyser = MorphologyAnalyser(self.get_root())
+
+        return list(dict.fromkeys(gloss.strip("-.") for prefix in [True, False] for gloss, _ in self.analyser.gloss_affixes(text, prefix)))
 
     def gloss_affixes(self, text):
-        return {gloss.strip("-.") for prefix in [True, False] for gloss, _ in self.get_root().gloss_affixes(text, prefix)}
+        glosses = self.glosses.get(text)
+        if glosses is None:
+            glosses = set(self.analyse(text))
+            self.glosses.put(text, glosses)
+
+        # Callers may modify the set they are given
+        return glosses.copy()
     
 
 class GraphWriter:
@@ -127,30 +307,21 @@ class GraphWriter:
         return self.update_node(text, gloss, label=f'<<u>{text}/{gloss}</u>>')
 
     def find_components(self, node: MorphologyNode):
-        for prefix in node.prefixes:
-            next = node.prefixes[prefix]
-            if prefix == '$':
-                for component in self.find_components(next):
-                    yield component
-
-                continue
-
+        for prefix, next in node.edges('prefixes'):
             id = self.add_affix(prefix, next.gloss)
             if self.verbose:
                 print(id, prefix)
             
             yield next, prefix, True
         
-        for suffix in node.suffixes:
-            next = node.suffixes[suffix]
+        for suffix, next in node.edges('suffixes'):
             id = self.add_affix(suffix, next.gloss)
             if self.verbose:
                 print(id, suffix)
             
             yield next, suffix, False
 
-        for item in node.items:
-            next = node.items[item]
+        for item, next in node.edges('items'):
             id = self.add_item(item, next.gloss)
             if self.verbose:
                 print(id, item)
@@ -165,8 +336,7 @@ class GraphWriter:
     
     def visit(self, node: MorphologyNode, text: str, prefix: bool):
         current = self.ids[text + node.gloss]        
-        for item in node.items:
-            next = node.items[item]
+        for item, next in node.edges('items'):
             edge = (text + node.gloss, next.gloss) 
             if edge in self.visited:
                 continue
@@ -175,8 +345,7 @@ class GraphWriter:
             self.add_edge(current, child, prefix)
             self.visited.add(edge)
 
-        for affix in node.prefixes:
-            next = node.prefixes[affix]
+        for affix, next in node.edges('prefixes'):
             edge = (text + node.gloss, next.gloss)
             if edge in self.visited:
                 continue
@@ -185,8 +354,7 @@ class GraphWriter:
             self.add_edge(current, child, prefix)
             self.visited.add(edge)
         
-        for affix in node.suffixes:
-            next = node.suffixes[affix]
+        for affix, next in node.edges('suffixes'):
             edge = (text + node.gloss, next.gloss) 
             if edge in self.visited:
                 continue
@@ -244,37 +412,112 @@ class MorphologyBuilder:
                 pass
 
 
-def generate(node: MorphologyNode):
-    for item in node.items:
-        yield item, node.items[item].gloss
-    
-    for prefix in node.prefixes:
-        next = node.prefixes[prefix]
-        for stem, gloss in generate(next):
+def generate(node: MorphologyNode, depth: int=None):
+    """Lazily generate forms and glosses, attaching at most depth affixes"""
+    for item, next in node.edges('items'):
+        yield item, next.gloss
+
+    if depth is not None and depth <= 0:
+        return
+
+    remaining = None if depth is None else depth - 1
+    for prefix, next in node.edges('prefixes'):
+        for stem, gloss in generate(next, remaining):
             yield prefix + stem, next.apply_gloss(gloss, True)
         
         yield prefix, next.gloss
     
-    for suffix in node.suffixes:
-        next = node.suffixes[suffix]
-        for stem, gloss in generate(next):
+    for suffix, next in node.edges('suffixes'):
+        for stem, gloss in generate(next, remaining):
             yield stem + suffix, next.apply_gloss(gloss, False)
         
         yield suffix, next.gloss
 
 
+def unique(forms):
+    seen = set()
+    for form in forms:
+        if form not in seen:
+            seen.add(form)
+            yield form
+
+
+def forms(graph: MorphologyGraph, depth: int=None, limit: int=None, distinct=False):
+    generated = generate(graph.get_root(), depth)
+    if distinct:
+        generated = unique(generated)
+
+    return islice(generated, limit)
+
+
+class GlossIndex:
+    """Surface forms realising each gloss, saved against the grammar and bounds they were generated from"""
+    version = 1
+
+    def __init__(self, signature: str, glosses: dict[str, list[str]]):
+        self.signature = signature
+        self.glosses = glosses
+
+    @staticmethod
+    def build(signature, generated):
+        glosses = {}
+        for form, gloss in unique(generated):
+            glosses.setdefault(gloss.strip("-."), []).append(form)
+
+        return GlossIndex(signature, glosses)
+
+    def realise(self, gloss: str):
+        """Forms whose gloss is, or contains as a component, the given gloss"""
+        component = re.compile(rf'(^|[.-]){re.escape(gloss)}($|[.-])')
+        for key, forms in self.glosses.items():
+            if component.search(key):
+                for form in forms:
+                    yield form, key
+
+    @staticmethod
+    def load(path, signature):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != GlossIndex.version or data.get('signature') != signature:
+            return None
+
+        return GlossIndex(signature, data['glosses'])
+
+    def save(self, path):
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'version': GlossIndex.version, 'signature': self.signature, 'glosses': self.glosses}, f, ensure_ascii=False)
+
+        os.replace(temporary, path)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Morphology Graph CLI")
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
     parser.add_argument('-g', '--generate', action='store_true', help='Generate all possible strings')
+    parser.add_argument('-d', '--depth', type=int, help='Attach at most this many affixes when generating')
+    parser.add_argument('-n', '--limit', type=int, help='Generate at most this many strings')
+    parser.add_argument('-u', '--unique', action='store_true', help='Remove duplicate generated strings')
+    parser.add_argument('-r', '--realise', action='append', help='Show forms realising a gloss')
+    parser.add_argument('-i', '--index', help='Reverse gloss index file, rebuilt when the grammar or bounds change')
     parser.add_argument('-t', '--test', action='store_true', help='Display test results')
     parser.add_argument('-o', '--output', help='Save to GraphML file')
+    parser.add_argument('--metrics', help='Write a JSON metrics record to this file')
     args = parser.parse_args()
 
+    metrics = Metrics('structure.morphology') if args.metrics else None
     graph = MorphologyGraph()
     builder = MorphologyBuilder(graph, args.verbose, args.test)
+    digest = hashlib.sha256(repr((args.depth, args.limit)).encode('utf-8'))
     for line in sys.stdin:        
         builder.parse(line)
+        digest.update(line.encode('utf-8'))
+        if metrics:
+            metrics.count('lines')
 
     if args.output:
         w = GraphWriter(args.verbose)
@@ -285,5 +528,22 @@ if __name__ == '__main__':
             f.writelines(line + '\n' for line in w.write())
 
     if args.generate:
-        for token, gloss in generate(graph.get_root()):
+        for token, gloss in forms(graph, args.depth, args.limit, args.unique):
             print(f'{token} {gloss}')
+            if metrics:
+                metrics.count('forms')
+
+    if args.realise:
+        index = GlossIndex.load(args.index, digest.hexdigest()) if args.index else None
+        if not index:
+            index = GlossIndex.build(digest.hexdigest(), forms(graph, args.depth, args.limit))
+            if args.index:
+                index.save(args.index)
+
+        for gloss in args.realise:
+            for token, key in index.realise(gloss):
+                print(f'{gloss}: {token} {key}')
+
+    if metrics:
+        metrics.count('nodes', len(graph.nodes))
+        metrics.write(args.metrics)
@@ -0,0 +1,84 @@
+import argparse
+import os
+import pickle
+
+from structure.formal import SyntaxBuilder
+from structure.morphology import MorphologyBuilder, MorphologyGraph
+
+
+class Snapshot:
+    """Compiled grammar (syntax and morphology), saved against the grammar file it was read from"""
+    version = 4
+
+    def __init__(self, path: str):
+        self.path = path
+        self.snapshot = path + '.snapshot'
+
+    def fingerprint(self):
+        stat = os.stat(self.path)
+        return Snapshot.version, stat.st_size, stat.st_mtime_ns
+
+    def read(self, cache_size=65536):
+        syntax = SyntaxBuilder()
+        morphology = MorphologyGraph(cache_size)
+        builder = MorphologyBuilder(morphology)
+        with open(self.path, 'r') as f:
+            for line in f.readlines():
+                line = syntax.parse(line)
+                if not line:
+                    continue
+
+                builder.parse(line)
+
+        # Compile the rule tables and affix tries now, so they are saved with the grammar
+        syntax.compile()
+        morphology.compile()
+        return syntax, morphology
+
+    def load(self):
+        """Saved grammar, or None if it is missing, unreadable or older than the grammar file"""
+        try:
+            if os.path.getmtime(self.snapshot) < os.path.getmtime(self.path):
+                return None
+
+            with open(self.snapshot, 'rb') as f:
+                fingerprint, syntax, morphology = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+
+        if fingerprint != self.fingerprint():
+            return None
+
+        return syntax, morphology
+
+    def save(self, syntax: SyntaxBuilder, morphology: MorphologyGraph):
+        temporary = f'{self.snapshot}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump((self.fingerprint(), syntax, morphology), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary, self.snapshot)
+
+    def open(self, cache_size=65536):
+        loaded = self.load()
+        if loaded:
+            syntax, morphology = loaded
+            morphology.glosses.size = cache_size
+            return syntax, morphology
+
+        syntax, morphology = self.read(cache_size)
+        try:
+            self.save(syntax, morphology)
+        except OSError:
+            pass
+
+        return syntax, morphology
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile a grammar into a snapshot for structure")
+    parser.add_argument('-g', '--grammar', help="Path to grammar")
+    args = parser.parse_args()
+
+    snapshot = Snapshot(args.grammar)
+    snapshot.save(*snapshot.read())
+    print(snapshot.snapshot)
@@ -0,0 +1,79 @@
+import hashlib
+from multiprocessing import Pool
+import os
+import pickle
+
+from structure.morphology import MorphologyGraph
+
+
+def normalise(word: str):
+    return word.lower().strip(',.?!"')
+
+
+def signature(path: str):
+    """Content hash of a grammar file, identifying the analyses made with it"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+_morphology: MorphologyGraph = None
+
+
+def start_worker(morphology: MorphologyGraph):
+    global _morphology
+    _morphology = morphology
+
+
+def analyse(text):
+    return text, _morphology.analyse(text)
+
+
+class Vocabulary:
+    """
+    Glosses of the distinct word types of an input, each analysed once.
+    Stands in for the morphology graph when reviewing utterances.
+    """
+    version = 1
+
+    def __init__(self, morphology: MorphologyGraph, signature: str):
+        self.morphology = morphology
+        self.signature = signature
+        self.glosses: dict[str, list[str]] = {}
+
+    def analyse(self, types, jobs=1):
+        missing = sorted(set(types) - self.glosses.keys())
+        if jobs > 1 and len(missing) > jobs:
+            with Pool(jobs, initializer=start_worker, initargs=(self.morphology,)) as pool:
+                self.glosses.update(pool.imap(analyse, missing, chunksize=max(1, len(missing) // (jobs * 4))))
+        else:
+            for text in missing:
+                self.glosses[text] = self.morphology.analyse(text)
+
+        return len(missing)
+
+    def gloss_affixes(self, text):
+        glosses = self.glosses.get(text)
+        if glosses is None:
+            return self.morphology.gloss_affixes(text)
+
+        return set(glosses)
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                version, signature, glosses = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+
+        if version != Vocabulary.version or signature != self.signature:
+            return False
+
+        self.glosses.update(glosses)
+        return True
+
+    def save(self, path):
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump((Vocabulary.version, self.signature, self.glosses), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary, path)
@@ -1,4 +1,6 @@
+import sys
 from corpus import Conversation, TokenType
+from estimate import Estimate, Sampler
 
 
 class ConversationFormatter:
@@ -23,11 +25,12 @@ class ConversationFormatter:
 
 
 class Summary:
-    def __init__(self, formatter: ConversationFormatter, conversations: list[Conversation], all, count):
+    def __init__(self, formatter: ConversationFormatter, conversations: list[Conversation], all, count, sampler: Sampler=None):
         self.formatter = formatter
         self.conversations = conversations
         self.all = all
         self.count = count
+        self.sampler = sampler
 
     def summarise(self, conversation: Conversation):
         summary = {}
@@ -43,8 +46,11 @@ class Summary:
                 total(turn.speaker)
                 continue
 
-            for _ in turn.text:
-                total(turn.speaker)
+            for _, (_, value) in turn.text:
+                if self.count == 'bases':
+                    total(' '.join(value) if isinstance(value, list) else value)
+                else:
+                    total(turn.speaker)
 
         return summary
 
@@ -62,6 +68,25 @@ class Summary:
         for k in all:
             yield all[k], k
 
+    def summarise_sample(self):
+        sampler = self.sampler
+        estimate = Estimate(sampler.population, sampler.confidence, corrected=sampler.rate >= 1)
+        for conversations in self.conversations:
+            counts = {}
+            for conversation in conversations:
+                summary = self.summarise(conversation)
+                for k in summary:
+                    counts[k] = counts.get(k, 0) + summary[k]
+
+            estimate.add(counts, 1 / sampler.rate)
+            if estimate.n >= sampler.minimum and estimate.error() <= sampler.error:
+                break
+
+        print(f'Sampled {estimate.n}/{estimate.population} documents, ±{estimate.error():.1%} at {sampler.confidence:.0%} confidence', file=sys.stderr)
+        for k in estimate.keys():
+            total, width = estimate.total(k)
+            yield round(total), f'±{width:.0f}', k
+
     def summarise_conversations(self):
         for conversation in self.conversations:
             summary = self.summarise(conversation)
@@ -73,7 +98,9 @@ class Summary:
             yield conversation.document, self.formatter.format_date(conversation), len(summary), c, summary
 
     def show(self):
-        if self.all:
+        if self.sampler:
+            lines = self.summarise_sample()
+        elif self.all:
             lines = self.summarise_all()
         else:
             lines = self.summarise_conversations()
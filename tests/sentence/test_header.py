@@ -1,6 +1,6 @@
 import numpy as np
 from content import Word
-from sentence.header import Header
+from sentence.header import Header, Lexicon
 
 
 lexicon = [
@@ -44,3 +44,32 @@ def test_match():
         effect = sut.match(prefix_features, stem)
 
         assert np.all(effect == expected_effect), message
+
+
+def test_lexicon_changes():
+    compiled = Lexicon(lexicon)
+    sut = Header(compiled)
+
+    before = sut.enter('kē')
+    compiled.append(('k', True, Word.features.none, Word.features.speaker, Word.features.none))
+    after = sut.enter('kē')
+
+    assert before[0] == 'kē' and np.all(before[1] == Word.features.none)
+    assert after[0] == 'ē' and np.all(after[1] == Word.features.speaker)
+
+
+def test_analyse():
+    compiled = Lexicon(lexicon)
+    sut = Header(compiled)
+
+    _, _, first = sut.analyse('āku')
+    first |= Word.features.number
+    stem, prefix_features, word_features = sut.analyse('āku')
+
+    assert compiled.analyses.hits == 1 and compiled.analyses.misses == 1
+    assert stem == 'ku' and np.all(word_features == Word.features.possessive + Word.features.alienable + Word.features.plural + Word.features.speaker)
+
+    compiled.pop()
+    sut.analyse('āku')
+
+    assert compiled.analyses.misses == 2, 'Changing the lexicon should invalidate analyses'
@@ -0,0 +1,86 @@
+import os
+import random
+import numpy as np
+
+from cache import ResultCache
+from content import Word
+from corpus import Corpus
+from files import FileReader
+from query import DocumentQuery
+from results import pack
+from sentence.layer import PhraseIndex, PhraseLayer
+from sentence.parser import lexicon
+from sentence.query import SentenceQuery
+
+
+document = '''<<mbc001>>
+{1/02/95}
+<Mere Rangi> Ka kōrero mai a Rehua ki a Pou, "Me āta mau rawa i tō tāua pātiki.
+<Ani Black> Ko ngā kaute mutunga, e rua ki te kore.
+<Hone Heke> Haere mai ana te konohi aroha me te roimata.
+He kōrero mā te iwi i te hui ki Māngere.
+<Ani Black> Kāore anō au kia rongo i te hā kakara.
+'''
+
+
+def lines(reader, cache, features, end, indexed):
+    query = SentenceQuery(lexicon, features, end, True, False, 0)
+    if cache:
+        query.layer = PhraseLayer(lexicon, cache)
+        query.indexed = indexed
+
+    documents = DocumentQuery(reader, Corpus(), query, None, None, None)
+    return [(n, v) for conversation in documents.query_all() for turn in conversation.turns for n, (_, v) in turn.text]
+
+
+def test_index(tmp_path):
+    with open(tmp_path / 'mbc001.txt', 'w', encoding='utf-8') as f:
+        f.write(document)
+
+    reader = FileReader(name=str(tmp_path / 'mbc{:03d}.txt'), encoding='utf-8')
+    cache = ResultCache(str(tmp_path / 'cache'), 2 ** 20)
+    expected = lines(reader, None, ['+determiner', '+preposition'], 3, False)
+
+    lines(reader, cache, ['+determiner'], 1, True)
+    layer = PhraseLayer(lexicon, cache)
+
+    assert layer.index(reader, 1) is not None, 'Index should be stored with the layer'
+    assert lines(reader, cache, ['+determiner', '+preposition'], 3, True) == expected, 'Indexed query should match the full scan'
+
+    # Layer evicted while its index remains
+    os.remove(cache.entry(cache.key('phrases', layer.signature, reader.name, 1)))
+    lines(reader, cache, ['+preposition+goal'], 1, True)
+
+    assert lines(reader, cache, ['+determiner', '+preposition'], 3, True) == expected, 'Rebuilt layer should cover every line'
+
+
+def test_find():
+    generator = random.Random(0)
+    size = len(np.asarray(Word.features.none))
+    def mask(*bits):
+        features = np.zeros(size, dtype=bool)
+        features[list(bits)] = True
+        return pack(features)
+
+    masks = [mask(*generator.sample(range(4), generator.randint(0, 2))) for _ in range(6)]
+    layer = {}
+    for n in range(20):
+        layer[n] = [(0, 0, [(0, 0, generator.choice(masks), None) for _ in range(generator.randint(1, 5))])]
+
+    def scan(terms):
+        lines = set()
+        for n, sentences in layer.items():
+            phrases = [features for _, _, features, _ in sentences[0][2]]
+            for i in range(len(phrases) - len(terms) + 1):
+                if all(m & on == on and not m & off for m, (on, off) in zip(phrases[i:], terms)):
+                    lines.add(n)
+
+        return lines
+
+    index = PhraseIndex(layer)
+    terms = [(0, 0), (mask(0), 0), (mask(1), mask(2)), (0, mask(0, 1))]
+    # Exact terms fix every feature
+    terms += [(m, index.exact & ~m) for m in masks[:3]]
+    for _ in range(100):
+        query = generator.choices(terms, k=generator.randint(1, 3))
+        assert index.find(query) == scan(query), query
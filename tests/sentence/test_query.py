@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import subprocess
+import sys
+from content import Word
+from query import FeatureQuery
+from sentence.parser import Phrase, lexicon
+from sentence.query import SentenceQuery
+
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+document = '''<<mbc{:03d}>>
+{{1/02/95}}
+<Mere Rangi> Ka kōrero mai a Rehua ki a Pou, "Me āta mau rawa i tō tāua pātiki.
+<Ani Black> Ko ngā kaute mutunga, e rua ki te kore.
+<Hone Heke> Haere mai ana te konohi aroha me te roimata.
+He kōrero mā te iwi i te hui ki Māngere.
+<Ani Black> Kāore anō au kia rongo i te hā kakara.
+'''
+
+
+def phrase(text, *features):
+    result = Phrase()
+    result.words = text.split()
+    for feature in features:
+        result.features |= feature
+
+    return result
+
+
+def scan(features, end, sentences):
+    """Greedy in-order scan of each sentence, as matched before the feature matrix"""
+    terms = [FeatureQuery(f) for f in features]
+    result = []
+    for _, sentence in sentences:
+        for i, p in enumerate(sentence):
+            if terms and not terms[0].match_word(p):
+                continue
+
+            buffer = sentence[i:i+end]
+            queries = list(terms)
+            for b in buffer:
+                if queries and queries[0].match_word(b):
+                    queries.pop(0)
+
+                if not queries:
+                    result.append(buffer)
+                    break
+
+    return result
+
+
+def test_match():
+    te = phrase('te whare', Word.features.determiner)
+    ki = phrase('ki te kura', Word.features.preposition, Word.features.goal, Word.features.determiner)
+    ka = phrase('ka haere', Word.features.none)
+    i = phrase('i te ata', Word.features.preposition, Word.features.determiner, Word.features.pause)
+
+    cases = [
+        ([(0, [te, ka, ki])], ['+determiner', '+preposition+goal'], 3, [[te, ka, ki]], 'Gapped terms should match within the window'),
+        ([(0, [te, ka, ki])], ['+determiner', '+preposition+goal'], 2, [], 'Gapped terms should not match beyond the window'),
+        ([(0, [te, ka]), (4, [ki])], ['+determiner', '+preposition'], 3, [], 'Terms should not match across sentences'),
+        ([(0, [te, ka]), (4, [ki, i])], ['+determiner'], 3, [[te, ka], [ki, i], [i]], 'Windows should end with the sentence'),
+        ([(0, [te, ka, ki])], ['+determiner'], 0, [], 'Empty windows should not match'),
+        ([(0, [te, ka]), (4, [ki])], [], 2, [[te, ka], [ka], [ki]], 'Every phrase should start a window without terms'),
+        ([(0, [te, ka, i])], ['+determiner', '+pause'], 2, [], 'Every term should be matched'),
+    ]
+
+    for sentences, features, end, expected, message in cases:
+        sut = SentenceQuery(lexicon, features, end, False, False, 2)
+
+        result = [buffer for _, buffer in sut.match(sentences)]
+
+        assert result == expected, message
+        assert result == scan(features, end, sentences), message
+
+
+def test_match_scan():
+    features = [Word.features.determiner, Word.features.preposition, Word.features.goal, Word.features.pause]
+    queries = [[], ['+determiner'], ['+preposition', '+determiner'], ['+determiner', '-pause', '+preposition+goal']]
+    generator = random.Random(0)
+    for _ in range(50):
+        sentences, start = [], 0
+        for _ in range(generator.randint(1, 4)):
+            sentence = [phrase(f'w{start + k}', *generator.sample(features, generator.randint(0, 2))) for k in range(generator.randint(1, 6))]
+            sentences.append((start, sentence))
+            start += len(sentence)
+
+        for end in range(5):
+            for terms in queries:
+                sut = SentenceQuery(lexicon, terms, end, False, False, 2)
+
+                matches = list(sut.match(sentences))
+
+                assert [buffer for _, buffer in matches] == scan(terms, end, sentences), (terms, end)
+                # Each phrase is one word, named by its offset
+                assert all((a, b) == (int(buffer[0].words[0][1:]), int(buffer[-1].words[0][1:]) + 1) for (a, b), buffer in matches), (terms, end)
+
+
+def write_corpus(path, n):
+    os.mkdir(path / 'MBC-raw')
+    for label in range(1, n + 1):
+        with open(path / 'MBC-raw' / f'mbc{label:03d}-not-stripped.txt', 'w', encoding='cp1252') as f:
+            # Raw transcripts mark macrons with diaereses
+            f.write(document.format(label).translate(str.maketrans('āō', 'äö')))
+
+
+def run_query(path, *args):
+    environment = {**os.environ, 'PYTHONPATH': root}
+    result = subprocess.run([sys.executable, '-m', 'sentence.query', *args], cwd=path, env=environment, capture_output=True)
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def test_jobs(tmp_path):
+    write_corpus(tmp_path, 5)
+    for args in [['-f', '+determiner', '-e', '2', '-b'], ['-f', '+determiner', '-e', '2'], ['-f', '+preposition', '-T']]:
+        expected = run_query(tmp_path, *args).stdout
+
+        assert expected.count(b'\n') > 5, args
+        assert run_query(tmp_path, *args, '-j', '3').stdout == expected, 'Parallel queries should print the same output as serial queries'
+
+
+def test_profile_jobs(tmp_path):
+    write_corpus(tmp_path, 5)
+    def stages(*args):
+        lines = run_query(tmp_path, '-f', '+determiner', '-e', '2', '-b', '--profile', *args).stderr.decode().splitlines()
+        return {name: (int(calls), int(items)) for name, calls, items, *_ in (line.split() for line in lines[1:-1])}
+
+    expected = stages()
+    result = stages('-j', '3')
+
+    for name in ['content', 'query', 'header', 'sentence']:
+        assert result[name] == expected[name], 'Stages run by workers should be counted'
+
+
+def test_metrics(tmp_path):
+    write_corpus(tmp_path, 5)
+    def metrics(*args):
+        run_query(tmp_path, '-f', '+determiner', '-e', '2', '-b', '--metrics', 'metrics.json', *args)
+        with open(tmp_path / 'metrics.json') as f:
+            return json.load(f)
+
+    serial = metrics('--cache', 'cache')
+    cached = metrics('--cache', 'cache', '-j', '3')
+    parallel = metrics('-j', '3')
+
+    assert set(serial) == {'command', 'arguments', 'finished', 'phrases', 'documents', 'lines', 'words', 'wall', 'cpu', 'throughput', 'peak_rss', 'cache'}
+    assert serial['command'] == 'sentence.query'
+    assert set(serial['throughput']) == {'phrases/s', 'documents/s', 'lines/s', 'words/s'}
+    assert serial['documents'] == 5 and serial['lines'] == 25 and serial['phrases'] > 0
+    assert serial['cache']['results'] == 0.0 and cached['cache']['results'] == 1.0, 'Worker cache hits should be counted'
+    assert 0 < serial['cache']['analyses'] <= 1
+    for name in ['phrases', 'documents', 'lines', 'words']:
+        assert parallel[name] == serial[name], 'Worker counters should be summed'
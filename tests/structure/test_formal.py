@@ -94,3 +94,54 @@ def test_read():
         result = utterance.extend(gloss, text)
 
         assert result.nodes == expected, message
+
+
+def test_clone():
+    ranking = Ranking({
+        '$': {'def', 'part', '$', '#'},
+        'def': {'*'}
+    })
+
+    logger = TestLogger()
+    te = Terminal('def.s', 'te')
+    whare = Terminal('*', 'whare')
+    i = Terminal('part.r', 'i')
+
+    utterance = Utterance(ranking, Mapper([]), logger).extend(te.gloss, te.text)
+    shared = utterance.stack
+    clone = utterance.clone(logger).extend(whare.gloss, whare.text)
+    utterance.extend(i.gloss, i.text)
+
+    assert utterance.nodes == [NonTerminal('$', None, te), i], 'Original should not see the clone'
+    assert clone.nodes == [te, whare], 'Clone should not see the original'
+    assert clone.stack.tail is shared, 'Clone should share the stack below where it diverged'
+
+
+def test_score():
+    te = Terminal('def.s', 'te')
+    whare = Terminal('*', 'whare')
+    phrase = NonTerminal('$', None, NonTerminal('ref', te, whare))
+
+    assert (phrase.score(), phrase.words(), str(phrase)) == (2, 2, 'te whare'), 'Phrase aggregates should cover its words'
+    assert phrase.includes({'def'}) and phrase.includes({'ref'}), 'Phrase should include word components and phrase glosses'
+
+    whare.gloss = 'N'
+
+    assert (phrase.score(), phrase.includes({'*'})) == (3, False), 'Reglossing a word should update its phrases'
+
+    other = NonTerminal('$', None, NonTerminal('ref', Terminal('def.s', 'te'), Terminal('*', 'kura')))
+    cached = other.right.aggregate
+    te.gloss = 'def.p'
+    whare.gloss = '*'
+
+    assert other.score() == 2 and other.right.aggregate is cached, 'Reglossing one phrase should keep the aggregates of others'
+    assert phrase.score() == 2
+
+    # Branches share the words read before they diverged
+    branch = NonTerminal('$', None, NonTerminal('ref', te, Terminal('N', 'kura')))
+    before = branch.score()
+    te.gloss = '*'
+
+    assert branch.score() != before, 'Reglossing a shared word should update every phrase containing it'
+    assert branch.score() == NonTerminal('$', None, NonTerminal('ref', Terminal('*', 'te'), Terminal('N', 'kura'))).score()
+    assert phrase.score() == NonTerminal('$', None, NonTerminal('ref', Terminal('*', 'te'), Terminal('*', 'whare'))).score()
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+from structure.formal import SyntaxBuilder
+from structure.functional import Reviewer
+from structure.morphology import MorphologyBuilder, MorphologyGraph
+from structure.writer import DotWriterFactory, InterpretationWriter
+
+
+grammar = os.path.join(os.path.dirname(__file__), '..', '..', 'input', 'graph.txt')
+
+
+def read_grammar():
+    syntax = SyntaxBuilder()
+    morphology = MorphologyGraph()
+    builder = MorphologyBuilder(morphology)
+    with open(grammar, 'r') as f:
+        for line in f.readlines():
+            line = syntax.parse(line)
+            if line:
+                builder.parse(line)
+
+    return syntax, morphology
+
+
+def test_beam():
+    syntax, morphology = read_grammar()
+    transcribed = [
+        'Nā rātou i kī mai ki a au tāku whare',
+        'Ka kōrero mai a Rehua ki a Pou, "Me āta mau rawa i tā tāua pōtiki.',
+        'Koinei te whakaaro a ētahi o tāua i te hui o ngā takawaenga mātauranga o te motu i Māngere inakuanei. Nō konei rā mātou rā ko Te Whiti te karaipiture, whakarunga ki roto i te, i te reo Māori.',
+        'Otirā, ā, hei parāoa, hei pata mā te whānau. Mā te pepa hei kawea te whakaaro rangatira i roto i ngā, i roto i ngā kōrero.'
+    ]
+    # Tied interpretations throughout
+    tied = [
+        'hoki, ana mā hei hoki ngaro',
+        'ana tō whai Whiti ana mā',
+        'hoki, hoki wā tāua ana'
+    ]
+
+    for annotate in [False, True]:
+        for text in transcribed + tied:
+            def read(beam):
+                interpretation = Reviewer(morphology, syntax, annotate, beam).read(text, line='1')
+                return list(InterpretationWriter('1', DotWriterFactory().create(text)).write(interpretation))
+
+            expected = read(None)
+
+            assert read(10 ** 6) == expected, 'Unbounded beam should reproduce the exhaustive reading, ties in order'
+            if text in transcribed:
+                assert read(64) == expected, 'A beam of 64 should keep the best interpretations'
+
+
+def test_default(tmp_path):
+    # Each has many interpretations with the lowest score, which a beam of 64 does not order as reading all does
+    texts = ['hoki, ana mā hei hoki ngaro', 'ana tō whai Whiti ana mā', 'ana mā hoki rā hei tāua ana mā hoki rā']
+    rows = ''.join(f'mbc001,{i},{text}\n' for i, text in enumerate(texts))
+    # Glosses are sets, so ties are ordered by string hashes
+    environment = {**os.environ, 'PYTHONPATH': os.path.join(os.path.dirname(__file__), '..', '..'), 'PYTHONHASHSEED': '0'}
+    def structure(*args):
+        output = tmp_path / 'out.dot'
+        result = subprocess.run([sys.executable, '-m', 'structure', '-g', grammar, '-H', 'Document,ID,Fragment', '-o', str(output), *args], input=rows, env=environment, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        with open(output) as f:
+            return f.read()
+
+    assert structure() == structure('-w', '0'), 'Interpretations should be read exhaustively by default'
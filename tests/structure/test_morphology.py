@@ -1,4 +1,4 @@
-from structure.morphology import MorphologyNode
+from structure.morphology import GlossIndex, MorphologyAnalyser, MorphologyGraph, MorphologyNode, forms
 
 
 def item(gloss, *overrides):
@@ -17,3 +17,50 @@ def test_gloss_affixes():
         result = sut.gloss_affixes(text, is_prefix)
 
         assert list(result) == expected
+
+
+def test_analyser():
+    cases = [
+        (item('').add_node('prefixes', 'tā', item('1n-').add_node('items', 'tou', item('p'))), 'tātou', True, [('1n-p', ())]),
+        (item('').add_node('suffixes', 'tou', item('-p').add_node('items', 'tā', item('1n'))), 'tātou', False, [('1n-p', ())]),
+        (item('').add_node('prefixes', 't', item('dem.s-', 'dem.p.').add_node('items', 'ā', item('dem.p.a'))), 'tā', True, [('dem.s-a', ())]),
+        (item('').add_node('items', 'ia', item('3s')).add_homonym('items', 'ia', item('dem')), 'ia', True, [('3s', ()), ('dem', ())])
+    ]
+
+    for sut, text, is_prefix, expected in cases:
+        assert list(sut.gloss_affixes(text, is_prefix)) == expected
+        assert MorphologyAnalyser(sut).gloss_affixes(text, is_prefix) == expected
+
+
+def test_gloss_cache():
+    graph = MorphologyGraph(size=1)
+    graph.add_node('ia', '3s')
+    graph.add_edge('$', 'ia', 'items')
+
+    glosses = graph.gloss_affixes('ia')
+    glosses.add('dem')
+    assert graph.gloss_affixes('ia') == {'3s'}
+    assert (graph.glosses.hits, graph.glosses.misses) == (1, 1)
+
+    graph.gloss_affixes('au')
+    assert len(graph.glosses) == 1
+
+    graph.add_node('au', '1s')
+    graph.add_edge('$', 'au', 'items')
+    assert graph.gloss_affixes('au') == {'1s'}
+
+
+def test_generate():
+    graph = MorphologyGraph()
+    graph.add_node('tou', '-p')
+    graph.add_node('tā', '1n')
+    graph.add_edge('$', 'tou', 'suffixes')
+    graph.add_edge('$', 'tou', 'suffixes')
+    graph.add_edge('tou', 'tā', 'items')
+
+    assert list(forms(graph, depth=0)) == []
+    assert list(forms(graph, depth=1)) == [('tātou', '1n-p'), ('tou', '-p')]
+    assert list(forms(graph, limit=1)) == [('tātou', '1n-p')]
+
+    index = GlossIndex.build('', forms(graph))
+    assert list(index.realise('1n')) == [('tātou', '1n-p')]
@@ -0,0 +1,67 @@
+import os
+import pickle
+import shutil
+from structure.snapshot import Snapshot
+
+
+grammar = os.path.join(os.path.dirname(__file__), '..', '..', 'input', 'graph.txt')
+words = ['ana', 'nō', 'anō', 'runga', 'ētahi', 'mātou', 'tāua', 'tēnā', 'rātou', 'mā', 'ngā', 'whakaaro']
+
+
+def copy_grammar(path):
+    shutil.copy(grammar, path / 'graph.txt')
+    return Snapshot(str(path / 'graph.txt'))
+
+
+def test_load(tmp_path):
+    snapshot = copy_grammar(tmp_path)
+    syntax, morphology = snapshot.open()
+
+    loaded = snapshot.load()
+
+    assert loaded is not None
+    syntax, saved = loaded
+    assert syntax.grammar is not None, 'Rule tables should be saved compiled'
+    assert saved.analyser is not None and saved.analyser.tries, 'Affix tries should be saved compiled'
+    compiled = len(saved.analyser.tries)
+    assert all(saved.gloss_affixes(word) for word in words[:-1])
+    for word in words:
+        assert saved.gloss_affixes(word) == morphology.gloss_affixes(word), word
+
+    assert len(saved.analyser.tries) == compiled, 'Every trie should already be compiled'
+
+
+def test_stale(tmp_path):
+    snapshot = copy_grammar(tmp_path)
+    snapshot.open()
+    stat = os.stat(snapshot.snapshot)
+
+    # Grammar edited after the snapshot
+    os.utime(snapshot.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert snapshot.load() is None, 'A snapshot older than the grammar should be rejected'
+
+    # Grammar edited without changing its modification time
+    with open(snapshot.path, 'a') as f:
+        f.write('r unusual\n')
+    os.utime(snapshot.path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+    assert snapshot.load() is None, 'A snapshot of a different sized grammar should be rejected'
+
+    syntax, _ = snapshot.open()
+    assert 'unusual' in syntax.ranks, 'A stale snapshot should be rebuilt'
+    assert snapshot.load() is not None
+
+
+def test_corrupt(tmp_path):
+    snapshot = copy_grammar(tmp_path)
+    snapshot.open()
+    with open(snapshot.snapshot, 'rb') as f:
+        data = f.read()
+
+    for corrupt in [b'', b'not a snapshot', data[:len(data) // 2], pickle.dumps(('other', 'record'))]:
+        with open(snapshot.snapshot, 'wb') as f:
+            f.write(corrupt)
+
+        assert snapshot.load() is None, corrupt[:20]
+
+    syntax, morphology = snapshot.open()
+    assert morphology.gloss_affixes('ētahi'), 'A corrupt snapshot should be rebuilt'
@@ -0,0 +1,66 @@
+import os
+import shutil
+from structure.formal import SyntaxBuilder
+from structure.functional import Reviewer
+from structure.morphology import MorphologyBuilder, MorphologyGraph
+from structure.vocabulary import Vocabulary, normalise, signature
+from structure.writer import DotWriterFactory, InterpretationWriter
+
+
+grammar = os.path.join(os.path.dirname(__file__), '..', '..', 'input', 'graph.txt')
+texts = [
+    'Nā rātou i kī mai ki a au tāku whare',
+    'Ka kōrero mai a Rehua ki a Pou, "Me āta mau rawa i tā tāua pōtiki.',
+    'Koinei te whakaaro a ētahi o tāua i te hui o ngā takawaenga mātauranga o te motu i Māngere inakuanei.',
+    'Otirā, ā, hei parāoa, hei pata mā te whānau.',
+    'hoki, ana mā hei hoki ngaro'
+]
+
+
+def read_grammar(path):
+    syntax = SyntaxBuilder()
+    morphology = MorphologyGraph()
+    builder = MorphologyBuilder(morphology)
+    with open(path, 'r') as f:
+        for line in f.readlines():
+            line = syntax.parse(line)
+            if line:
+                builder.parse(line)
+
+    return syntax, morphology
+
+
+def test_batch():
+    syntax, morphology = read_grammar(grammar)
+    def read(reviewer):
+        return [list(InterpretationWriter('1', DotWriterFactory().create(text)).write(reviewer.read(text, line='1'))) for text in texts]
+
+    expected = read(Reviewer(morphology, syntax, False, None))
+    for jobs in [1, 2]:
+        vocabulary = Vocabulary(morphology, signature(grammar))
+        vocabulary.analyse({normalise(word) for text in texts for word in text.split()}, jobs)
+        reviewer = Reviewer(morphology, syntax, False, None)
+        reviewer.morphology = vocabulary
+
+        assert read(reviewer) == expected, 'Batch analysis should read each utterance as it is read alone'
+
+
+def test_stale(tmp_path):
+    path = str(tmp_path / 'graph.txt')
+    shutil.copy(grammar, path)
+    _, morphology = read_grammar(path)
+    vocabulary = Vocabulary(morphology, signature(path))
+    vocabulary.analyse(['whare', 'au'])
+    vocabulary.save(str(tmp_path / 'vocabulary'))
+
+    assert Vocabulary(morphology, signature(path)).load(str(tmp_path / 'vocabulary'))
+
+    with open(path, 'a') as f:
+        f.write('n whare noun\ne $ whare items\n')
+
+    _, morphology = read_grammar(path)
+    vocabulary = Vocabulary(morphology, signature(path))
+
+    assert not vocabulary.load(str(tmp_path / 'vocabulary')), 'Analyses made with another grammar should be rejected'
+    vocabulary.analyse(['whare', 'au'])
+    assert vocabulary.gloss_affixes('whare') == {'noun'}
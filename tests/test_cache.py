@@ -0,0 +1,47 @@
+import os
+from cache import ResultCache
+
+
+def test_get(tmp_path):
+    sut = ResultCache(str(tmp_path), 2 ** 20)
+    key = sut.key('query', 1)
+
+    assert sut.get(key, (1, 1)) is None, 'Missing entry should miss'
+
+    sut.put(key, (1, 1), ['line'])
+
+    assert sut.get(key, (1, 1)) == ['line'], 'Stored entry should hit'
+    assert (sut.hits, sut.misses, sut.invalidated) == (1, 1, 0)
+    assert sut.get(key, (2, 1)) is None, 'Changed source should invalidate the entry'
+    assert (sut.hits, sut.misses, sut.invalidated) == (1, 2, 1)
+    assert not os.path.exists(sut.entry(key)), 'Invalidated entry should be removed'
+    assert sut.hit_rate() == 1 / 3
+
+
+def test_evict(tmp_path):
+    sut = ResultCache(str(tmp_path), 2 ** 20)
+    keys = [sut.key('query', i) for i in range(3)]
+    for i, key in enumerate(keys):
+        sut.put(key, (i,), b'x' * 1000)
+        os.utime(sut.entry(key), ns=(i * 10 ** 9, i * 10 ** 9))
+
+    sut.size = 2500
+    sut.evict()
+
+    assert [os.path.exists(sut.entry(key)) for key in keys] == [False, True, True], 'Least recently used entries should be evicted first'
+
+
+def test_missing(tmp_path, monkeypatch):
+    sut = ResultCache(str(tmp_path), 2 ** 20)
+    key = sut.key('query')
+    sut.put(key, (1,), 'value')
+    with open(sut.entry(key), 'wb') as f:
+        f.write(b'corrupt')
+
+    assert sut.get(key, (1,)) is None, 'Unreadable entry should miss'
+
+    # Entries removed by another process while evicting are skipped
+    stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda path, *args, **kwargs: stat(str(path) + '.missing' if str(path).endswith('.pkl') else path, *args, **kwargs))
+    sut.size = 0
+    sut.evict()
@@ -0,0 +1,67 @@
+import os
+import random
+import subprocess
+from collections import Counter
+from corpus import Conversation, Turn, TokenType
+from counts import BaseCounts, SpaceSaving
+
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+lines = [
+    ['ka', 'kōrero', 'a Rehua', 'ki a Pou'],
+    ['ko', 'ngā kaute', 'e rua'],
+    ['ka', 'haere', 'a Rehua'],
+    ['ka', 'kōrero', 'te iwi', 'ki Māngere'],
+    ['he', 'kōrero', 'mā te iwi'],
+    ['ka', 'haere', 'a Pou', 'ki a Rehua'],
+    ['kāore', 'anō', 'au'],
+    ['e', 'rua', 'te kaute'],
+    ['ka', 'kōrero', 'a Rehua'],
+    ['ka', 'haere', 'a Rehua2'],
+    ['ka', 'haere', 'a Rehua10'],
+]
+
+
+def pipeline(position):
+    """Counts of a column of space separated bases, as counted by count.sh"""
+    script = f"tr ' ' , | awk -F',' '{{print ${position}}}' | sort | uniq -c | sed -e 's/^ *//' | sort -k 1 -V -r"
+    text = ''.join(' '.join(base.replace(' ', '_') for base in bases) + '\n' for bases in lines)
+    result = subprocess.run(['bash', '-c', script], input=text, capture_output=True, text=True, env={**os.environ, 'LC_ALL': 'C.UTF-8'})
+    return result.stdout.splitlines()
+
+
+def test_exact():
+    conversation = Conversation('mbc001', '1/02/95')
+    turn = Turn('Mere Rangi')
+    for n, bases in enumerate(lines):
+        turn.add_text(n, (TokenType.content, [base.replace(' ', '_') for base in bases]))
+
+    conversation.add_turn(turn)
+    counts = BaseCounts([1, 2, 3]).count([conversation])
+
+    for position in [1, 2, 3]:
+        assert counts.sorted((None, position)) == pipeline(position), position
+
+
+def test_bounds():
+    generator = random.Random(0)
+    vocabulary = [f'w{i}' for i in range(50)]
+    weights = [1 / (i + 1) for i in range(50)]
+    stream = generator.choices(vocabulary, weights, k=5000)
+    capacity = 10
+    table = SpaceSaving(capacity)
+    for item in stream:
+        table.add(item)
+
+    expected = Counter(stream)
+    kept = {item: (lower, error) for item, lower, error in table.bounds()}
+
+    assert len(kept) == capacity
+    for item, (lower, error) in kept.items():
+        assert lower <= expected[item] <= lower + error, item
+        assert error <= len(stream) / capacity, 'Overcount should be at most the stream length over the capacity'
+
+    for item, count in expected.items():
+        if count > len(stream) / capacity:
+            assert item in kept, 'Items more frequent than the stream length over the capacity should be kept'
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+from corpus import Corpus
+from files import FileReader
+from progress import Progress
+from query import DocumentQuery, TextQuery, limit_lines
+
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+document = '''<<mbc{:03d}>>
+{{1/02/95}}
+<Mere Rangi> Ka kōrero mai a Rehua ki a Pou.
+<Ani Black> Ko ngā kaute mutunga, e rua ki te kore.
+'''
+
+
+class CountingReader(FileReader):
+    def __init__(self, name):
+        super().__init__(name, 'utf-8')
+        self.read = []
+
+    def read_file(self, label):
+        self.read.append(label)
+        return super().read_file(label)
+
+
+def write_documents(path, n):
+    for label in range(1, n + 1):
+        with open(path / f'mbc{label:03d}.txt', 'w', encoding='utf-8') as f:
+            f.write(document.format(label))
+
+    return CountingReader(str(path / 'mbc{:03d}.txt'))
+
+
+def write_corpus(path, n):
+    os.mkdir(path / 'MBC-raw')
+    for label in range(1, n + 1):
+        with open(path / 'MBC-raw' / f'mbc{label:03d}-not-stripped.txt', 'w', encoding='cp1252') as f:
+            # Raw transcripts mark macrons with diaereses
+            f.write(document.format(label).translate(str.maketrans('āō', 'äö')))
+
+
+def run_mbc(path, *args):
+    environment = {**os.environ, 'PYTHONPATH': root}
+    return subprocess.run([sys.executable, '-m', 'mbc', *args], cwd=path, env=environment, capture_output=True, text=True)
+
+
+def test_limit_lines(tmp_path):
+    reader = write_documents(tmp_path, 3)
+    documents = DocumentQuery(reader, Corpus(), TextQuery([], None, False, 0), None, None, None)
+
+    result = list(limit_lines(documents.query_all(), 1))
+
+    assert [len(turn.text) for conversation in result for turn in conversation.turns] == [1], 'Limit should truncate lines'
+    assert reader.read == [1], 'Documents after the limit is reached should not be read'
+
+
+def test_timeout(tmp_path):
+    reader = write_documents(tmp_path, 3)
+    progress = Progress(timeout=1e-9)
+    documents = DocumentQuery(reader, Corpus(), TextQuery([], None, False, 0), None, None, None, progress=progress)
+
+    assert list(documents.query_all()) == [], 'Timed out query should stop'
+    assert progress.interrupted.startswith('Query exceeded'), 'Timeout should be recorded as the interruption'
+    assert progress.checkpoint is None
+
+
+def test_resume(tmp_path):
+    reader = write_documents(tmp_path, 3)
+    progress = Progress()
+    documents = DocumentQuery(reader, Corpus(), TextQuery([], None, False, 0), None, None, None, progress=progress)
+
+    result = list(documents.query_all(start=2))
+
+    assert [conversation.document for conversation in result] == ['mbc002', 'mbc003'], 'Resumed query should start after the checkpoint'
+    assert reader.read == [2, 3, 4]
+    assert progress.checkpoint == 3
+
+
+def test_interrupt(tmp_path):
+    write_corpus(tmp_path, 2)
+
+    def mbc(*args):
+        return run_mbc(tmp_path, *args)
+
+    saved = mbc('-o', 'saved.pkl')
+    assert saved.returncode == 0, saved.stderr
+
+    # Queries over saved results and single documents stop cleanly on timeout
+    for args in [['-R', 'saved.pkl'], ['-d', '1', '-g', '3']]:
+        result = mbc(*args, '--timeout', '1e-9')
+
+        assert result.returncode == 0, result.stderr
+        assert 'Interrupted (Query exceeded' in result.stderr, args
+
+
+def test_refine(tmp_path):
+    write_corpus(tmp_path, 3)
+    saved = run_mbc(tmp_path, '-o', 'saved.pkl', '-t', '6')
+    assert saved.returncode == 0, saved.stderr
+
+    for args in [['-t', '6', '-q', 'te'], ['-t', '6', '-q', 'Rehua', '-T']]:
+        refined = run_mbc(tmp_path, '-R', 'saved.pkl', *args)
+        expected = run_mbc(tmp_path, *args)
+
+        assert refined.stdout.count('\n') > 1, args
+        assert refined.stdout == expected.stdout, 'Refining a saved set should match the query over the corpus'
+
+
+def test_jobs(tmp_path):
+    write_corpus(tmp_path, 5)
+    for args in [['-q', 'te'], ['-T']]:
+        expected = run_mbc(tmp_path, *args)
+
+        assert expected.stdout.count('\n') >= 5, args
+        assert run_mbc(tmp_path, *args, '-j', '3').stdout == expected.stdout, 'Parallel queries should print the same output as serial queries'
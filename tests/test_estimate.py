@@ -0,0 +1,108 @@
+import math
+import random
+from statistics import NormalDist
+from corpus import Conversation, Turn, TokenType
+from estimate import Estimate, Sampler
+from summary import ConversationFormatter, Summary
+
+
+def test_order():
+    labels = list(range(1, 101))
+    sampler = Sampler(seed=1)
+
+    order = sampler.order(iter(labels))
+
+    assert sorted(order) == labels, 'Every document should be sampled once'
+    assert order != labels, 'Documents should be read in random order'
+    assert sampler.population == 100
+    assert Sampler(seed=1).order(labels) == order, 'Seeded samples should be repeatable'
+
+
+def test_include():
+    sampler = Sampler('line', rate=0.25, seed=2)
+
+    included = sum(sampler.include('line') for _ in range(10000))
+
+    assert abs(included / 10000 - 0.25) < 0.02, 'Lines should be included at the sampling rate'
+    assert all(sampler.include('conversation') for _ in range(100)), 'Other units should always be read'
+    assert Sampler('document', rate=0.25).rate == 1.0, 'Documents are sampled by order, not rate'
+
+
+def test_scaling():
+    estimate = Estimate(10, corrected=False)
+    for _ in range(4):
+        estimate.add({'a': 3, 'b': 1}, 1 / 0.25)
+
+    assert estimate.total('a') == (120, 0), 'Counts should be scaled by the inverse rate and population'
+    assert estimate.total('b') == (40, 0)
+
+
+def test_interval():
+    population = [2, 4, 4, 5, 7, 9, 10, 12, 15, 20]
+    sample = population[:4]
+    estimate = Estimate(len(population))
+    for value in sample:
+        estimate.add({'a': value})
+
+    total, width = estimate.total('a')
+    mean = sum(sample) / 4
+    variance = sum((v - mean) ** 2 for v in sample) / 3
+    z = NormalDist().inv_cdf(0.975)
+
+    assert math.isclose(total, 10 * mean)
+    assert math.isclose(width, z * 10 * math.sqrt((1 - 4 / 10) * variance / 4)), 'Width should be corrected for the finite population'
+    assert math.isclose(estimate.error(), width / total)
+
+    for value in population[4:]:
+        estimate.add({'a': value})
+
+    assert estimate.total('a') == (sum(population), 0), 'A full sample should be exact'
+
+
+def test_coverage():
+    generator = random.Random(3)
+    population = [generator.randint(0, 50) for _ in range(200)]
+    covered = 0
+    for _ in range(1000):
+        estimate = Estimate(len(population))
+        for value in generator.sample(population, 30):
+            estimate.add({'a': value})
+
+        total, width = estimate.total('a')
+        covered += abs(total - sum(population)) <= width
+
+    assert 0.92 < covered / 1000 < 0.98, 'Intervals should cover the population total at the stated confidence'
+
+
+def test_stop(capsys):
+    read = []
+    def documents():
+        for label in range(1, 21):
+            read.append(label)
+            conversation = Conversation(f'mbc{label:03d}', '1/02/95')
+            turn = Turn('Mere Rangi')
+            turn.add_text(1, (TokenType.content, 'Kia ora'))
+            # Half the documents have a second line, so the error falls as documents are read
+            if label % 2:
+                turn.add_text(2, (TokenType.content, 'Kia ora'))
+
+            conversation.add_turn(turn)
+            yield [conversation]
+
+    sampler = Sampler(error=0.2, minimum=5)
+    sampler.population = 20
+
+    lines = list(Summary(ConversationFormatter(0), documents(), True, 'lines', sampler).summarise_sample())
+
+    estimate = Estimate(20)
+    for label in read:
+        estimate.add({'Mere Rangi': 2 if label % 2 else 1})
+
+    assert 5 <= len(read) < 20, 'Sampling should stop before reading every document'
+    assert estimate.error() <= 0.2, 'Sampling should stop at the target error'
+    before = Estimate(20)
+    for label in read[:-1]:
+        before.add({'Mere Rangi': 2 if label % 2 else 1})
+    assert len(read) == 5 or before.error() > 0.2, 'Sampling should not stop early'
+    assert lines[0][2] == 'Mere Rangi'
+    assert f'Sampled {len(read)}/20 documents' in capsys.readouterr().err